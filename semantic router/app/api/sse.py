@@ -0,0 +1,114 @@
+import asyncio
+import json
+import re
+import time
+from typing import AsyncGenerator, AsyncIterator
+
+try:
+    import orjson
+except ImportError:
+    # Declared in requirements.txt; the stdlib fallback only keeps a partial install working.
+    orjson = None
+    print("SSE Warning: orjson is not installed; frames are encoded with the slower stdlib json")
+
+def encode_json_string(text: str) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(text)
+    return json.dumps(text, ensure_ascii=False).encode()
+
+class SSEEncoder:
+    """
+    Renders OpenAI-style `chat.completion.chunk` SSE frames for one stream. Everything
+    except the delta text is fixed for the whole stream, so the frame is pre-rendered
+    once and each token only costs escaping its text into the template.
+    """
+    def __init__(self, model: str, created: int | None = None):
+        created = int(time.time()) if created is None else created
+        head = json.dumps({
+            "id": f"chatcmpl-{created}",
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+        })[:-1].encode()
+        self._content_prefix = b"data: " + head + b', "choices": [{"index": 0, "delta": {"content": '
+        self._content_suffix = b'}, "finish_reason": null}]}\n\n'
+        self.stop_frame = b"data: " + head + b', "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}\n\n'
+
+    def content(self, text: str) -> bytes:
+        return self._content_prefix + encode_json_string(text) + self._content_suffix
+
+DONE_FRAME = b"data: [DONE]\n\n"
+
+# Sentence ends flush right away; clause breaks only once the piece is long enough to speak.
+# The lookahead on whitespace keeps "10.000" or "3,5" from being split.
+_SENTENCE_END = re.compile(r"[.!?…]+(?=\s)")
+_CLAUSE_END = re.compile(r"[,;:]+(?=\s)")
+
+def speakable_prefix(buffer: str, min_chars: int) -> int:
+    """
+    Length of the longest prefix of `buffer` ending on a sentence boundary, or on a
+    clause boundary at least `min_chars` long (0 if there is none yet).
+    """
+    cut = 0
+    for match in _SENTENCE_END.finditer(buffer):
+        cut = match.end()
+    for match in _CLAUSE_END.finditer(buffer, cut):
+        if match.end() >= min_chars:
+            cut = match.end()
+    if cut:
+        # Keep the separating space with the text already spoken.
+        while cut < len(buffer) and buffer[cut].isspace():
+            cut += 1
+    return cut
+
+async def coalesce(chunks: AsyncGenerator[str, None], max_delay: float, min_chars: int) -> AsyncIterator[str]:
+    """
+    Regroups LLM deltas into speakable units for TTS: text is emitted at sentence or
+    clause boundaries, or once it has waited `max_delay` seconds, whichever comes first.
+    """
+    loop = asyncio.get_running_loop()
+    iterator = chunks.__aiter__()
+    buffer = ""
+    deadline = 0.0
+    pending: asyncio.Future | None = None
+    try:
+        while True:
+            if buffer:
+                # Something is waiting to be spoken: don't wait on upstream past its deadline.
+                if pending is None:
+                    pending = asyncio.ensure_future(iterator.__anext__())
+                done, _ = await asyncio.wait({pending}, timeout=max(0.0, deadline - loop.time()))
+                if not done:
+                    yield buffer
+                    buffer = ""
+                    continue
+                step, pending = pending, None
+                try:
+                    chunk = step.result()
+                except StopAsyncIteration:
+                    break
+            else:
+                try:
+                    chunk = await (pending if pending is not None else iterator.__anext__())
+                except StopAsyncIteration:
+                    break
+                finally:
+                    pending = None
+
+            if not chunk:
+                continue
+            if not buffer:
+                deadline = loop.time() + max_delay
+            buffer += chunk
+            cut = speakable_prefix(buffer, min_chars)
+            if cut:
+                yield buffer[:cut]
+                buffer = buffer[cut:]
+                deadline = loop.time() + max_delay
+        if buffer:
+            yield buffer
+    finally:
+        if pending is not None:
+            pending.cancel()
+            await asyncio.gather(pending, return_exceptions=True)
+        await chunks.aclose()
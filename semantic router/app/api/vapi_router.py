@@ -1,13 +1,22 @@
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse, JSONResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
-import json
 import time
-from app.flows.manager import flow_manager
+from app.api.sse import DONE_FRAME, SSEEncoder, coalesce
+from app.core.admission import Overloaded, turn_limit
+from app.core.config import settings
+from app.core.lifecycle import lifecycle
+from app.core.tracing import TurnTrace
+from app.flows.manager import FlowManager
 
 router = APIRouter()
 
+def get_flow_manager() -> FlowManager:
+    if not lifecycle.ready:
+        raise HTTPException(status_code=503, detail="Server is warming up")
+    return lifecycle.flow_manager
+
 class Message(BaseModel):
     role: str
     content: str
@@ -18,17 +27,20 @@ class VapiRequest(BaseModel):
     stream: bool = False
     call: Optional[Dict[str, Any]] = None 
 
+# How often the SSE generator checks whether Vapi is still connected
+DISCONNECT_CHECK_INTERVAL = 0.25
+
+# Spoken when the server sheds a turn instead of making the caller wait in silence
+OVERLOADED_REPLY = "Disculpe, en este momento tengo muchas llamadas. ¿Me lo puede repetir en unos segundos?"
+
 @router.post("/chat/completions")
-async def vapi_chat_completion(request: VapiRequest):
+async def vapi_chat_completion(request: VapiRequest, http_request: Request, flow_manager: FlowManager = Depends(get_flow_manager)):
     # 1. Identify call_id
     call_id = "default_session"
     if request.call and "id" in request.call:
         call_id = request.call["id"]
     
-    # 2. Get Flow
-    flow = flow_manager.get_or_create_flow(call_id)
-    
-    # 3. Get last user message
+    # 2. Get last user message
     if not request.messages:
          return JSONResponse({"content": "No messages received"})
          
@@ -42,14 +54,20 @@ async def vapi_chat_completion(request: VapiRequest):
         })
 
     user_text = last_message.content
+    trace = TurnTrace(call_id, user_text)
 
     if request.stream:
-        # Use real streamer
-        generator = flow.process_input_stream(user_text)
-        return StreamingResponse(vapi_sse_generator(generator), media_type="text/event-stream")
+        # Use real streamer (loads the call's flow, runs the turn, commits the session)
+        generator = flow_manager.process_turn_stream(call_id, user_text, trace)
+        return StreamingResponse(vapi_sse_generator(generator, http_request, trace), media_type="text/event-stream")
     else:
         # Non-streaming
-        response_text = await flow.process_input(user_text)
+        try:
+            async with turn_limit.slot():
+                response_text = await flow_manager.process_turn(call_id, user_text, trace)
+            trace.finish()
+        except Overloaded:
+            response_text = OVERLOADED_REPLY
         return {
             "id": "chatcmpl-mock",
             "object": "chat.completion",
@@ -64,42 +82,62 @@ async def vapi_chat_completion(request: VapiRequest):
             }]
         }
 
-async def vapi_sse_generator(generator):
-    chunk_id = f"chatcmpl-{int(time.time())}"
+@router.post("/vapi/events")
+async def vapi_server_event(request: Request, flow_manager: FlowManager = Depends(get_flow_manager)):
+    """
+    Vapi server-message webhook. Used to drop call state as soon as a call ends.
+    """
+    try:
+        payload = await request.json()
+    except ValueError:
+        payload = None
+    message = (payload.get("message") or {}) if isinstance(payload, dict) else None
+    if not isinstance(message, dict):
+        return JSONResponse({"ok": False, "error": "Expected a JSON object with a 'message' object"}, status_code=400)
+    event_type = message.get("type")
+    call = message.get("call")
+    call_id = call.get("id") if isinstance(call, dict) else None
+
+    call_ended = event_type == "end-of-call-report" or (
+        event_type == "status-update" and message.get("status") == "ended"
+    )
+    if call_id and call_ended:
+        await flow_manager.end_flow(call_id)
+    return {"ok": True}
+
+async def vapi_sse_generator(generator, http_request: Request = None, trace: TurnTrace = None):
+    encoder = SSEEncoder(settings.GROQ_MODEL)
+    if settings.SSE_COALESCE:
+        generator = coalesce(generator, settings.SSE_COALESCE_MAX_DELAY_MS / 1000, settings.SSE_COALESCE_MIN_CHARS)
+    next_disconnect_check = time.monotonic() + DISCONNECT_CHECK_INTERVAL
     
-    async for text_chunk in generator:
-        if not text_chunk:
-            continue
-            
-        data = {
-            "id": chunk_id,
-            "object": "chat.completion.chunk",
-            "created": int(time.time()),
-            "model": "llama-3.1-70b-versatile",
-            "choices": [
-                {
-                    "index": 0,
-                    "delta": {"content": text_chunk},
-                    "finish_reason": None
-                }
-            ]
-        }
-        # JSON formatting for Vapi
-        yield f"data: {json.dumps(data)}\n\n"
+    try:
+        async with turn_limit.slot():
+            async for text_chunk in generator:
+                if not text_chunk:
+                    continue
+
+                # Stop consuming upstream tokens as soon as the caller has gone away.
+                if http_request is not None and time.monotonic() >= next_disconnect_check:
+                    if await http_request.is_disconnected():
+                        return
+                    next_disconnect_check = time.monotonic() + DISCONNECT_CHECK_INTERVAL
+
+                yield encoder.content(text_chunk)
+                if trace is not None:
+                    trace.mark("ttft")
+    except Overloaded:
+        # Shed before the turn committed: the caller hears a short "busy" line and
+        # repeating the sentence starts the same turn again.
+        yield encoder.content(OVERLOADED_REPLY)
+        trace = None
+    finally:
+        # Closing the turn generator cancels its in-flight Groq stream.
+        await generator.aclose()
+        # Turns the caller hung up on are timed and counted too.
+        if trace is not None:
+            trace.finish()
 
     # End of stream
-    data_end = {
-        "id": chunk_id,
-        "object": "chat.completion.chunk",
-        "created": int(time.time()),
-        "model": "llama-3.1-70b-versatile",
-        "choices": [
-            {
-                "index": 0,
-                "delta": {},
-                "finish_reason": "stop"
-            }
-        ]
-    }
-    yield f"data: {json.dumps(data_end)}\n\n"
-    yield "data: [DONE]\n\n"
+    yield encoder.stop_frame
+    yield DONE_FRAME
@@ -0,0 +1,113 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from app.core.config import settings
+from app.core.metrics import Counter, Gauge, Histogram
+
+INFLIGHT = Gauge("upstream_inflight", "Requests holding a slot, per upstream", ("upstream",))
+QUEUED = Gauge("upstream_queued", "Requests waiting for a slot, per upstream", ("upstream",))
+QUEUE_WAIT = Histogram(
+    "upstream_queue_wait_seconds", "Time spent waiting for a slot", ("upstream",),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+REJECTED = Counter("upstream_rejections_total", "Requests shed instead of queued", ("upstream", "reason"))
+
+class Overloaded(Exception):
+    def __init__(self, upstream: str, reason: str):
+        super().__init__(f"{upstream} is overloaded ({reason})")
+        self.upstream = upstream
+        self.reason = reason
+
+class Limiter:
+    """
+    Bounded concurrency for one upstream, with a bounded FIFO wait queue. A request that
+    finds the queue full, or waits longer than `queue_timeout`, raises Overloaded right
+    away instead of piling onto a saturated service. max_concurrency <= 0 disables it.
+    """
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    def try_acquire(self) -> bool:
+        """
+        Takes a slot only if one is free right now (never queues); pair with release().
+        For optional extra work, such as hedged requests, that must not exceed the limit.
+        """
+        if self.max_concurrency <= 0:
+            return True
+        if self.active >= self.max_concurrency or self._waiters:
+            return False
+        self.active += 1
+        INFLIGHT.set(self.active, upstream=self.name)
+        return True
+
+    def release(self):
+        if self.max_concurrency > 0:
+            self._release()
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.max_concurrency <= 0:
+            yield
+            return
+        await self._acquire()
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self):
+        if self.active < self.max_concurrency and not self._waiters:
+            self.active += 1
+            INFLIGHT.set(self.active, upstream=self.name)
+            QUEUE_WAIT.observe(0.0, upstream=self.name)
+            return
+        if len(self._waiters) >= self.max_queue:
+            REJECTED.inc(upstream=self.name, reason="queue_full")
+            raise Overloaded(self.name, "queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        QUEUED.set(len(self._waiters), upstream=self.name)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up: pass it on.
+                self._release()
+            else:
+                waiter.cancel()
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            QUEUED.set(len(self._waiters), upstream=self.name)
+            if isinstance(e, asyncio.TimeoutError):
+                REJECTED.inc(upstream=self.name, reason="timeout")
+                raise Overloaded(self.name, "timeout") from None
+            raise
+        QUEUE_WAIT.observe(time.perf_counter() - start, upstream=self.name)
+
+    def _release(self):
+        # Hand the slot straight to the oldest waiter; `active` stays the same.
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                QUEUED.set(len(self._waiters), upstream=self.name)
+                return
+        self.active -= 1
+        INFLIGHT.set(self.active, upstream=self.name)
+
+# Front door: whole turns in flight at /chat/completions
+turn_limit = Limiter("turns", settings.ADMISSION_MAX_TURNS, settings.ADMISSION_MAX_QUEUE, settings.ADMISSION_QUEUE_TIMEOUT)
+# Upstreams a turn fans out to
+encoder_limit = Limiter("encoder", settings.LIMIT_ENCODER_CONCURRENCY, settings.LIMIT_ENCODER_QUEUE, settings.LIMIT_QUEUE_TIMEOUT)
+qdrant_limit = Limiter("qdrant", settings.LIMIT_QDRANT_CONCURRENCY, settings.LIMIT_QDRANT_QUEUE, settings.LIMIT_QUEUE_TIMEOUT)
+groq_limit = Limiter("groq", settings.LIMIT_GROQ_CONCURRENCY, settings.LIMIT_GROQ_QUEUE, settings.LIMIT_QUEUE_TIMEOUT)
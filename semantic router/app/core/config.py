@@ -1,16 +1,103 @@
+from typing import Dict
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     GROQ_API_KEY: str
     GROQ_MODEL: str = "llama-3.1-70b-versatile"
+    GROQ_BASE_URL: str | None = None
+    GROQ_ASYNC: bool = True
+    GROQ_MAX_CONNECTIONS: int = 50
+    GROQ_KEEPALIVE_EXPIRY: float = 30.0
+    GROQ_CONNECT_TIMEOUT: float = 3.0
+    GROQ_READ_TIMEOUT: float = 20.0
     
     QDRANT_URL: str
     QDRANT_API_KEY: str
     QDRANT_COLLECTION: str = "semantic-router-index"
+    QDRANT_MAX_CONNECTIONS: int = 20
+    QDRANT_TIMEOUT: float = 5.0
+    
+    # Routing
+    ROUTER_ENCODER_BACKEND: str = "torch"  # "torch" (HuggingFaceEncoder) or "onnx"
+    ROUTER_ENCODER_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    ROUTER_ONNX_DIR: str = "models/onnx"  # exported models, one subdirectory per model
+    ROUTER_ONNX_QUANTIZE: bool = True  # dynamic int8 weights
+    ROUTER_ONNX_THREADS: int = 0  # intra-op threads per encoder worker; 0 = cores / ROUTER_ENCODER_WORKERS
+    ROUTER_ENCODER_WORKERS: int = 2
+    ROUTER_TOP_K: int = 5
+    ROUTER_BATCH_ENABLED: bool = True
+    ROUTER_BATCH_MAX_SIZE: int = 32
+    ROUTER_BATCH_MAX_WAIT_MS: float = 5.0
+    ROUTER_INDEX_MODE: str = "qdrant"  # "qdrant" or "local"
+    ROUTER_LOCAL_INDEX_PATH: str | None = None
+    ROUTER_ROUTE_THRESHOLDS: Dict[str, float] = {}
+    ROUTER_INDEX_POLL_INTERVAL: float = 30.0  # 0 disables index change detection
+    ROUTE_CACHE_ENABLED: bool = True
+    ROUTE_CACHE_MAX_SIZE: int = 5000
+    ROUTE_CACHE_TTL: float = 3600.0
+    ROUTE_CACHE_EMBEDDING_MAX_SIZE: int = 5000  # 0 disables the embedding tier
+    # Start the LLM request in parallel with routing; costs a wasted request when routing changes node
+    SPECULATIVE_GENERATION: bool = False
+    # Cache of the first reply of nodes declared "canned" or "cache" in the flow definition
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_MAX_SIZE: int = 2000
+    RESPONSE_CACHE_TTL: float = 86400.0
+    
+    # Streaming to Vapi
+    # Group LLM deltas into sentence/clause-sized SSE frames for TTS
+    SSE_COALESCE: bool = False
+    SSE_COALESCE_MAX_DELAY_MS: float = 200.0
+    SSE_COALESCE_MIN_CHARS: int = 20  # shortest piece flushed at a clause break
+    
+    # Admission control: turns beyond these limits get a spoken "busy" reply instead of queuing
+    ADMISSION_MAX_TURNS: int = 200  # 0 disables
+    ADMISSION_MAX_QUEUE: int = 50
+    ADMISSION_QUEUE_TIMEOUT: float = 0.5
+    # Per-upstream concurrency (0 disables) and wait queue; a shed router check keeps the current node
+    LIMIT_ENCODER_CONCURRENCY: int = 64
+    LIMIT_ENCODER_QUEUE: int = 128
+    LIMIT_QDRANT_CONCURRENCY: int = 20
+    LIMIT_QDRANT_QUEUE: int = 100
+    LIMIT_GROQ_CONCURRENCY: int = 50
+    LIMIT_GROQ_QUEUE: int = 50
+    LIMIT_QUEUE_TIMEOUT: float = 0.5
+    
+    # Sessions
+    SESSION_MAX_ACTIVE: int = 1000
+    SESSION_IDLE_TTL: float = 900.0
+    SESSION_SWEEP_INTERVAL: float = 60.0
+    SESSION_BACKEND: str = "memory"  # "memory", "sqlite" or "redis"
+    SESSION_SQLITE_PATH: str = "sessions.db"
+    SESSION_REDIS_URL: str = "redis://localhost:6379/0"
+    
+    # Startup: a failed warmup is retried with exponential backoff; once out of attempts
+    # /health (liveness) fails so the orchestrator restarts the process
+    STARTUP_RETRY_ATTEMPTS: int = 3
+    STARTUP_RETRY_BACKOFF: float = 2.0
+    
+    # LLM tail latency: hedge a slow first token, retry transient errors before it
+    LLM_HEDGE_AFTER_MS: float = 0.0  # 0 disables hedging
+    LLM_HEDGE_MODEL: str | None = None  # None = GROQ_MODEL; a smaller model answers faster
+    LLM_RETRY_ATTEMPTS: int = 2
+    LLM_RETRY_BACKOFF_MS: float = 100.0
+    
+    # Tools
+    LLM_MAX_TOOL_ROUNDS: int = 2
+    TOOL_TIMEOUT: float = 5.0
+    
+    # Conversation history
+    HISTORY_TOKEN_BUDGET: int = 1500
+    HISTORY_RECENT_TURNS: int = 4
+    HISTORY_COMPACT_THRESHOLD: float = 0.75  # summarize once history + summary exceed this share of the budget
+    HISTORY_COMPACT_MIN_TURNS: int = 4  # fewest older turns folded into one summary
+    HISTORY_SUMMARY_MODEL: str = "llama-3.1-8b-instant"
     
     LANGFUSE_SECRET_KEY: str
     LANGFUSE_PUBLIC_KEY: str
     LANGFUSE_HOST: str = "https://cloud.langfuse.com"
+    LANGFUSE_PROMPTS_ENABLED: bool = False  # serve managed prompts instead of the built-in defaults
+    LANGFUSE_PROMPT_TTL: float = 300.0
+    LANGFUSE_TRACE_SAMPLE_RATE: float = 0.0  # fraction of turns sent to Langfuse as a timing trace
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,110 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Dict
+from app.core.config import settings
+from app.core.metrics import Counter, Gauge
+
+STARTUP_STAGE_SECONDS = Gauge("app_startup_stage_seconds", "Duration of each startup stage", ("stage",))
+STARTUP_FAILURES = Counter("app_startup_failures_total", "Failed startup attempts", ("stage",))
+APP_READY = Gauge("app_ready", "1 once resources are built and warmed up")
+
+class Lifecycle:
+    """
+    Builds the FlowManager and its clients after the server is listening, then warms
+    them up (model kernels, Qdrant and Groq connections). Liveness is answered right
+    away; readiness only once warmup has finished, so deploys keep traffic off cold pods.
+    A failed startup is retried with backoff; if every attempt fails, `error` is set and
+    liveness fails too, so the process is restarted instead of idling unready forever.
+    """
+    def __init__(self):
+        self.flow_manager = None
+        self.ready = False
+        self.error: str | None = None
+        self.timings: Dict[str, float] = {}
+        self._current_stage: str | None = None
+        self._task: asyncio.Task | None = None
+
+    @asynccontextmanager
+    async def _stage(self, name: str):
+        start = time.perf_counter()
+        self._current_stage = name
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timings[name] = round(elapsed, 4)
+            STARTUP_STAGE_SECONDS.set(elapsed, stage=name)
+
+    async def _start(self):
+        attempts = settings.STARTUP_RETRY_ATTEMPTS + 1
+        for attempt in range(attempts):
+            try:
+                await self._start_once()
+                break
+            except Exception as e:
+                STARTUP_FAILURES.inc(stage=self._current_stage or "unknown")
+                error = f"{type(e).__name__}: {e}"
+                # Partially built clients are dropped; the next attempt builds them again.
+                await self._close_flow_manager()
+                if attempt + 1 >= attempts:
+                    self.error = error
+                    print(f"Startup Error: {self.error}")
+                    return
+                delay = settings.STARTUP_RETRY_BACKOFF * 2 ** attempt
+                print(f"Startup Warning: attempt {attempt + 1}/{attempts} failed ({error}); retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+        self.ready = True
+        APP_READY.set(1)
+        total = sum(self.timings.values())
+        print(f"Startup complete in {total:.2f}s: {self.timings}")
+
+    async def _start_once(self):
+        # Imported here so that importing the app never loads models or opens clients.
+        from app.flows.manager import FlowManager
+        from app.flows.graph import flow_graph
+        from app.flows.nodes import get_langfuse, prompt_cache
+
+        async with self._stage("build_flow_manager"):
+            # Model loading is blocking; keep the loop free to answer liveness probes.
+            self.flow_manager = await asyncio.to_thread(FlowManager)
+        async with self._stage("build_langfuse"):
+            await asyncio.to_thread(get_langfuse)
+        async with self._stage("preload_prompts"):
+            await prompt_cache.preload(node.prompt_name for node in flow_graph.nodes.values())
+        async with self._stage("warmup_encoder"):
+            await self.flow_manager.router_service.encode("hola, buenos días")
+        async with self._stage("warmup_qdrant"):
+            await self.flow_manager.router_service.ping()
+        async with self._stage("warmup_groq"):
+            try:
+                await self.flow_manager.llm_service.warmup()
+            except Exception as e:
+                # Not fatal: the first turn will open the connection instead.
+                print(f"Startup Warning: Groq warmup failed: {e}")
+        async with self._stage("start_background_tasks"):
+            await self.flow_manager.start()
+
+    async def _close_flow_manager(self):
+        flow_manager, self.flow_manager = self.flow_manager, None
+        if flow_manager is not None:
+            try:
+                await flow_manager.stop()
+            except Exception as e:
+                print(f"Startup Warning: cleanup failed: {e}")
+
+    def start(self):
+        self.ready = False
+        self.error = None
+        self._task = asyncio.get_running_loop().create_task(self._start())
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self.ready = False
+        APP_READY.set(0)
+        await self._close_flow_manager()
+
+lifecycle = Lifecycle()
@@ -0,0 +1,98 @@
+import asyncio
+import random
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Dict, TypeVar
+from app.core.config import settings
+from app.core.metrics import Counter, Histogram
+
+TURN_STAGE_SECONDS = Histogram(
+    "turn_stage_seconds", "Latency of each stage of a voice turn", ("stage", "node", "route"),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.5, 5.0, 10.0),
+)
+TURN_TRACES = Counter("turn_traces_total", "Sampled turn traces sent to Langfuse", ("outcome",))
+
+T = TypeVar("T")
+
+class TurnTrace:
+    """
+    Stage timings of one voice turn, from the request reaching /chat/completions to the
+    last SSE frame. Stages are durations in seconds:
+      route      - check_router_transition (lexical, cache, encoder and index)
+      encode     - encoder call inside routing (absent on cache hits)
+      index      - Qdrant / local index search
+      llm_ttft   - Groq request to first token
+      llm_total  - Groq request to last token (all tool rounds)
+      ttft       - request arrival to first SSE frame written
+      turn       - request arrival to end of stream
+    Recording is a perf_counter() call and a dict write; histograms are only updated once
+    the turn ends, labelled with the node that answered and the route that was matched.
+    """
+    __slots__ = ("call_id", "input", "output", "node", "route", "start", "stages")
+
+    def __init__(self, call_id: str, text: str = ""):
+        self.call_id = call_id
+        self.input = text
+        self.output = ""
+        self.node = ""
+        self.route = "none"
+        self.start = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def mark(self, stage: str):
+        # Time since the request arrived; only the first mark of a stage counts.
+        if stage not in self.stages:
+            self.stages[stage] = time.perf_counter() - self.start
+
+    def finish(self):
+        self.mark("turn")
+        for stage, seconds in self.stages.items():
+            TURN_STAGE_SECONDS.observe(seconds, stage=stage, node=self.node, route=self.route)
+        rate = settings.LANGFUSE_TRACE_SAMPLE_RATE
+        if rate > 0 and random.random() < rate:
+            # Fire and forget: the SDK call runs on a worker thread, never on the response path.
+            # The outcome is counted back on the loop, where metrics are read and written.
+            sending = asyncio.get_running_loop().run_in_executor(None, self._send)
+            sending.add_done_callback(self._count_sent)
+
+    @staticmethod
+    def _count_sent(sending: asyncio.Future):
+        if not sending.cancelled():
+            TURN_TRACES.inc(outcome=sending.result())
+
+    def _send(self) -> str:
+        from app.flows.nodes import get_langfuse
+        try:
+            get_langfuse().create_event(
+                name="voice_turn",
+                input=self.input,
+                output=self.output,
+                metadata={
+                    "call_id": self.call_id,
+                    "node": self.node,
+                    "route": self.route,
+                    "stages_ms": {stage: round(seconds * 1000, 1) for stage, seconds in self.stages.items()},
+                },
+            )
+            return "sent"
+        except Exception as e:
+            print(f"Langfuse Warning: Could not send turn trace. Error: {e}")
+            return "error"
+
+# The trace of the turn running in the current task (None outside a traced turn)
+current_trace: ContextVar[TurnTrace | None] = ContextVar("current_trace", default=None)
+
+async def timed(stage: str, awaitable: Awaitable[T]) -> T:
+    """
+    Awaits `awaitable` and adds its duration to `stage` of the current turn, if any.
+    """
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        trace = current_trace.get()
+        if trace is not None:
+            trace.add(stage, time.perf_counter() - start)
@@ -0,0 +1,127 @@
+import re
+from typing import Any, Dict, List, Tuple
+from app.flows.nodes import (
+    RootGreetingNode, QualifyStartNode, QualifyDetailsNode,
+    OfferAppointmentNode, BookingProcessNode, RejectionScopeNode,
+    RejectionLocationNode, TransferLogicNode, BaseNode
+)
+from app.flows.responses import REPLY_POLICIES
+from app.services.route_cache import normalize_text
+
+HANDOFF = {"human_handoff": "transfer_logic"}
+
+# Declarative flow: node -> semantic routes it listens to (route -> target node) and
+# post-turn transitions checked in order on the user's normalized text.
+# "reply" lets a node's first reply be served from the response cache: "canned" (same
+# reply whatever was said) or "cache" (keyed on the user's normalized text).
+FLOW_DEFINITION: Dict[str, Any] = {
+    "start": "root_greeting",
+    "nodes": {
+        "root_greeting": {
+            "node": RootGreetingNode,
+            # "pricing_info": "offer_appointment" # Maybe?
+            "routes": {**HANDOFF, "legal_issue_traffic": "qualify_start"},
+            # Same greeting for the same opening line
+            "reply": "cache",
+        },
+        "qualify_start": {
+            "node": QualifyStartNode,
+            "routes": HANDOFF,
+            # Node B -> Node C or F (Location check)
+            "transitions": [
+                {"match": r"\b(cordoba|capital)\b", "to": "qualify_details"},
+                {"match": r"\b(buenos aires|rosario|lejos)\b", "to": "rejection_location"},
+            ],
+        },
+        "qualify_details": {
+            "node": QualifyDetailsNode,
+            "routes": HANDOFF,
+            # Node C -> Node D: move on after any real answer
+            "transitions": [{"min_length": 4, "to": "offer_appointment"}],
+        },
+        "offer_appointment": {
+            "node": OfferAppointmentNode,
+            "routes": HANDOFF,
+            # Node D -> Node E (Booking)
+            "transitions": [{"match": r"\b(si|quiero|agendar|cita)\b", "to": "booking_process"}],
+            # Availability is ready before the caller even says yes
+            "prefetch": ["check_availability"],
+        },
+        "booking_process": {"node": BookingProcessNode, "routes": HANDOFF},
+        # Fixed explanations: the first reply is canned, follow-ups go to the LLM.
+        "rejection_scope": {"node": RejectionScopeNode, "routes": HANDOFF, "reply": "canned"},
+        "rejection_location": {"node": RejectionLocationNode, "routes": HANDOFF, "reply": "canned"},
+        # Already handing off: no route changes anything here.
+        "transfer_logic": {"node": TransferLogicNode, "reply": "canned"},
+    },
+}
+
+class FlowGraph:
+    """
+    FLOW_DEFINITION compiled once at startup: one shared node instance per state (never
+    mutated per call), tool payloads built once, and a single regex per node for its
+    keyword transitions.
+    """
+    def __init__(self, definition: Dict[str, Any]):
+        specs = definition["nodes"]
+        self.nodes: Dict[str, BaseNode] = {name: spec["node"]() for name, spec in specs.items()}
+        self.start = self.nodes[definition["start"]]
+
+        self._route_targets: Dict[str, Dict[str, BaseNode]] = {}
+        self._matchers: Dict[str, Tuple[re.Pattern, List[BaseNode]]] = {}
+        self._min_length: Dict[str, Tuple[int, BaseNode]] = {}
+
+        for name, spec in specs.items():
+            node = self.nodes[name]
+            routes = spec.get("routes", {})
+            self._route_targets[name] = {route: self._node(target) for route, target in routes.items()}
+            node.routes = list(routes)
+            node.tools = [{"type": "function", "function": func} for func in node.functions] or None
+            node.prefetch = list(spec.get("prefetch", []))
+            node.reply_policy = self._reply_policy(node, spec.get("reply"))
+
+            patterns, targets = [], []
+            for transition in spec.get("transitions", []):
+                if "match" in transition:
+                    patterns.append(f"(?P<t{len(targets)}>{transition['match']})")
+                    targets.append(self._node(transition["to"]))
+                elif "min_length" in transition:
+                    self._min_length[name] = (transition["min_length"], self._node(transition["to"]))
+            if patterns:
+                self._matchers[name] = (re.compile("|".join(patterns)), targets)
+
+    @staticmethod
+    def _reply_policy(node: BaseNode, policy: str | None) -> str | None:
+        if policy is None:
+            return None
+        if policy not in REPLY_POLICIES:
+            raise ValueError(f"Node '{node.name}' has unknown reply policy '{policy}'")
+        # Tools receive the FlowInstance: a reply built from their results depends on the call.
+        if node.tools or node.prefetch:
+            raise ValueError(f"Node '{node.name}' uses tools, its replies can't be cached")
+        return policy
+
+    def _node(self, name: str) -> BaseNode:
+        if name not in self.nodes:
+            raise ValueError(f"Flow definition references unknown node '{name}'")
+        return self.nodes[name]
+
+    def route_target(self, node: BaseNode, route: str | None) -> BaseNode | None:
+        if route is None:
+            return None
+        return self._route_targets[node.name].get(route)
+
+    def match_transition(self, node: BaseNode, user_text: str) -> BaseNode | None:
+        matcher = self._matchers.get(node.name)
+        if matcher is not None:
+            pattern, targets = matcher
+            # Earlier transitions win when several keywords appear in the text.
+            matched = [int(m.lastgroup[1:]) for m in pattern.finditer(normalize_text(user_text))]
+            if matched:
+                return targets[min(matched)]
+        min_length = self._min_length.get(node.name)
+        if min_length is not None and len(user_text) >= min_length[0]:
+            return min_length[1]
+        return None
+
+flow_graph = FlowGraph(FLOW_DEFINITION)
@@ -0,0 +1,95 @@
+import asyncio
+from typing import Dict, List
+from app.core.config import settings
+from app.core.metrics import Counter, Histogram
+
+PROMPT_TOKENS = Histogram(
+    "flow_prompt_history_tokens", "Estimated history tokens sent to the LLM per request",
+    labels=("stage",), buckets=(100, 250, 500, 1000, 1500, 2000, 4000, 8000, 16000),
+)
+SUMMARIES = Counter("flow_history_summaries_total", "Rolling summaries produced", ("outcome",))
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for Llama tokenizers on Spanish text; cheap and close enough for budgeting.
+    return len(text) // 4 + 1
+
+def message_tokens(message: Dict) -> int:
+    # +4 for the role/formatting overhead of every chat message
+    return estimate_tokens(message.get("content") or "") + 4
+
+class HistoryManager:
+    """
+    Keeps the prompt history of a FlowInstance within a token budget:
+    pinned case data, a rolling summary of older turns and the most recent turns verbatim.
+    Summaries are produced in a background task, never on the turn's critical path, and
+    only once the history nears the budget, folding several turns at a time.
+    """
+    def __init__(self, token_budget: int, recent_turns: int, compact_threshold: float = 0.75, compact_min_turns: int = 4):
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.compact_at = token_budget * compact_threshold
+        self.compact_min_turns = compact_min_turns
+
+    def build_prompt_history(self, flow) -> List[Dict]:
+        pinned = []
+        if flow.data:
+            facts = "; ".join(f"{key}: {value}" for key, value in flow.data.items())
+            pinned.append({"role": "system", "content": f"Datos ya obtenidos del caso (no los vuelvas a preguntar): {facts}"})
+        if flow.summary:
+            pinned.append({"role": "system", "content": f"Resumen de la conversación anterior: {flow.summary}"})
+
+        used = sum(message_tokens(m) for m in pinned)
+        recent = []
+        for message in reversed(flow.history):
+            cost = message_tokens(message)
+            if used + cost > self.token_budget:
+                break
+            recent.append(message)
+            used += cost
+        recent.reverse()
+        # Never open the window with an assistant reply whose question was cut off.
+        if recent and recent[0]["role"] == "assistant":
+            used -= message_tokens(recent.pop(0))
+
+        raw = flow.compacted_tokens + sum(message_tokens(m) for m in flow.history)
+        PROMPT_TOKENS.observe(raw, stage="raw")
+        PROMPT_TOKENS.observe(used, stage="compacted")
+        return pinned + recent
+
+    def schedule_compaction(self, flow):
+        """
+        Starts summarizing the turns older than the recent window once the history and
+        summary take more than `compact_at` tokens and at least `compact_min_turns` turns
+        are outside the window, unless a summary is already being produced for this flow.
+        Below that, the whole history fits the prompt and a summary is a wasted Groq call.
+        """
+        if len(flow.history) - self.recent_turns * 2 < self.compact_min_turns * 2:
+            return
+        used = estimate_tokens(flow.summary) + sum(message_tokens(m) for m in flow.history)
+        if used <= self.compact_at:
+            return
+        if flow._summary_task is not None and not flow._summary_task.done():
+            return
+        flow._summary_task = asyncio.get_running_loop().create_task(self._compact(flow))
+
+    async def _compact(self, flow):
+        older = flow.history[:len(flow.history) - self.recent_turns * 2]
+        try:
+            summary = await flow.llm_service.summarize(older, flow.summary)
+        except Exception as e:
+            # Keep the turns; they stay in the prompt (budget permitting) and we retry next turn.
+            print(f"History summary error for call {flow.call_id}: {e}")
+            SUMMARIES.inc(outcome="error")
+            return
+        # Turns appended while summarizing sit after `older`, so dropping the prefix is safe.
+        flow.history = flow.history[len(older):]
+        flow.summary = summary
+        flow.compacted_tokens += sum(message_tokens(m) for m in older)
+        SUMMARIES.inc(outcome="ok")
+
+history_manager = HistoryManager(
+    token_budget=settings.HISTORY_TOKEN_BUDGET,
+    recent_turns=settings.HISTORY_RECENT_TURNS,
+    compact_threshold=settings.HISTORY_COMPACT_THRESHOLD,
+    compact_min_turns=settings.HISTORY_COMPACT_MIN_TURNS,
+)
@@ -1,19 +1,72 @@
-from typing import Dict, List, AsyncGenerator
-from app.services.llm_service import SmartLLMService
+import asyncio
+import json
+import time
+import uuid
+from typing import Dict, List, AsyncGenerator, Tuple
+from app.core.config import settings
+from app.core.metrics import Counter, Histogram
+from app.core.tracing import TurnTrace, current_trace, timed
+from app.flows.graph import flow_graph
+from app.flows.history import history_manager
+from app.flows.responses import response_cache
+from app.flows.sessions import SessionStore
+from app.flows.turns import Turn, TurnCoordinator
+from app.flows.session_backends import SessionConflict, create_session_backend
+from app.services.llm_service import ERROR_REPLY, SmartLLMService
 from app.services.router_service import RouterService
-from app.flows.nodes import (
-    RootGreetingNode, QualifyStartNode, QualifyDetailsNode,
-    OfferAppointmentNode, BookingProcessNode, RejectionScopeNode,
-    RejectionLocationNode, TransferLogicNode, BaseNode
+from app.services.tools import tool_registry
+from app.flows.nodes import BaseNode
+
+TOOL_PREFETCH = Counter("tool_prefetch_total", "Prefetched tool results by whether the LLM used them", ("tool", "result"))
+SPECULATIONS = Counter("flow_speculations_total", "Speculative generations by outcome (hit = kept)", ("outcome",))
+SPECULATION_TTFT_SAVED = Histogram(
+    "flow_speculation_ttft_saved_seconds", "Routing time overlapped with the LLM request on speculation hits",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5),
 )
 
 class FlowInstance:
     def __init__(self, call_id: str, llm_service: SmartLLMService):
         self.call_id = call_id
         self.llm_service = llm_service
-        self.current_node: BaseNode = RootGreetingNode()
+        self.current_node: BaseNode = flow_graph.start
+        self.node_replies = 0 # Replies given since the flow entered current_node
         self.history: List[Dict] = []
         self.data: Dict = {} # Store gathered info like local identification
+        self.summary = "" # Rolling summary of the turns no longer kept in `history`
+        self.compacted_tokens = 0 # Estimated tokens of the turns folded into `summary`
+        self.version = 0 # Session backend version this state was loaded from / saved as
+        self._summary_task: asyncio.Task | None = None
+        self._prefetched: Dict[str, asyncio.Task] = {}
+
+    def snapshot(self) -> bytes:
+        """
+        Compact serialized state for the session backend.
+        """
+        state = {
+            "node": self.current_node.name,
+            "node_replies": self.node_replies,
+            "history": self.history,
+            "data": self.data,
+            "summary": self.summary,
+            "compacted_tokens": self.compacted_tokens,
+        }
+        return json.dumps(state, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    @classmethod
+    def from_snapshot(cls, call_id: str, llm_service: SmartLLMService, raw: bytes, version: int) -> "FlowInstance":
+        state = json.loads(raw)
+        flow = cls(call_id, llm_service)
+        flow.current_node = flow_graph.nodes[state["node"]]
+        # Older snapshots: assume the node already answered, so no canned reply is replayed.
+        flow.node_replies = state.get("node_replies", 1)
+        flow.history = state["history"]
+        flow.data = state["data"]
+        flow.summary = state.get("summary", "")
+        flow.compacted_tokens = state.get("compacted_tokens", 0)
+        flow.version = version
+        # Restored on another worker or after eviction: prefetch as if the node was just entered.
+        flow._start_prefetch(flow.current_node)
+        return flow
     
     async def process_input(self, text: str) -> str:
         """Non-streaming wrapper"""
@@ -23,104 +76,293 @@ class FlowInstance:
         return full_resp
 
     async def process_input_stream(self, text: str) -> AsyncGenerator[str, None]:
+        # Flow state (node, history) is only written once the whole response has been
+        # generated, so a turn cancelled midway (barge-in) leaves no trace.
+
         # 1. Helper to determine transition BEFORE generating response (if possible)
         # or we might want to let the LLM generate first.
         # For RootGreeting, we rely on Router.
-        
-        transitioned_node = await self.check_router_transition(text)
-        if transitioned_node:
-            self.current_node = transitioned_node
-            # We might want to clear history or keep it? 
-            # Usually keep it so LLM knows context, but with different system prompt.
-        
-        # 2. Get System Message
-        system_message = self.current_node.get_system_message()
-        
-        # 2.1 Get Tools if any
-        tools = None
-        if self.current_node.functions:
-            tools = []
-            for func in self.current_node.functions:
-                tools.append({
-                    "type": "function",
-                    "function": func
-                })
+        node = self.current_node
+        if settings.SPECULATIVE_GENERATION and node.routes:
+            stream, node = await self._speculate(text, node)
+        else:
+            transitioned_node = await self.check_router_transition(text)
+            if transitioned_node:
+                node = transitioned_node
+                # We might want to clear history or keep it? 
+                # Usually keep it so LLM knows context, but with different system prompt.
+            stream = self._generate(node, text)
 
         # 3. Stream Response
         full_response = ""
-        async for chunk in self.llm_service.get_response_stream(
-            text=text, 
-            system_message=system_message, 
-            history=self.history,
-            tools=tools
-        ):
+        async for chunk in stream:
             full_response += chunk
             yield chunk
         
-        # 4. Update History
+        trace = current_trace.get()
+        if trace is not None:
+            trace.node = node.name
+            trace.output = full_response
+
+        # 4. Commit: node and history
+        self.enter_node(node)
+        self.node_replies += 1
         self.history.append({"role": "user", "content": text})
         self.history.append({"role": "assistant", "content": full_response})
+        history_manager.schedule_compaction(self)
         
         # 5. Post-Response Transition Checks (Logic based on user input content or flow state)
         self.check_post_interaction_transition(text, full_response)
 
+    def _generate(self, node: BaseNode, text: str, tool_gate: asyncio.Future | None = None) -> AsyncGenerator[str, None]:
+        # The first reply after entering a canned/cacheable node may already be cached.
+        first_reply = node is not self.current_node or self.node_replies == 0
+        cache_key = response_cache.key(node, text) if first_reply else None
+        if cache_key is not None:
+            reply = response_cache.get(node, cache_key)
+            if reply is not None:
+                return self._replay(reply)
+
+        # 2. Get System Message (tools are built once, when the flow graph is compiled)
+        system_message = node.get_system_message()
+
+        stream = self.llm_service.get_response_stream(
+            text=text, 
+            system_message=system_message, 
+            # A cached reply is keyed on node and input only, so it's generated without
+            # the call's history and pinned data.
+            history=None if cache_key is not None else history_manager.build_prompt_history(self),
+            tools=node.tools,
+            tool_executor=self.execute_tools if tool_gate is None else self._gated_tools(tool_gate),
+        )
+        if cache_key is not None:
+            return self._store_reply(node, cache_key, stream)
+        return stream
+
+    @staticmethod
+    async def _replay(reply: str) -> AsyncGenerator[str, None]:
+        yield reply
+
+    async def _store_reply(self, node: BaseNode, cache_key: tuple, stream: AsyncGenerator[str, None]) -> AsyncGenerator[str, None]:
+        # Only a reply streamed to the end is stored (not a discarded speculation or barge-in).
+        reply = ""
+        try:
+            async for chunk in stream:
+                reply += chunk
+                yield chunk
+        finally:
+            await stream.aclose()
+        response_cache.put(node, cache_key, reply, self.data, failed=reply.rstrip().endswith(ERROR_REPLY))
+
+    def enter_node(self, node: BaseNode):
+        """
+        Moves the flow to `node` and starts the node's prefetch tools in the background.
+        """
+        if node is self.current_node:
+            return
+        self.current_node = node
+        self.node_replies = 0
+        self._start_prefetch(node)
+
+    def _start_prefetch(self, node: BaseNode):
+        for task in self._prefetched.values():
+            task.cancel()
+        self._prefetched = {
+            name: asyncio.get_running_loop().create_task(tool_registry.run(name, {}, self))
+            for name in node.prefetch
+        }
+
+    def _gated_tools(self, gate: asyncio.Future):
+        async def execute(tool_calls: List[Dict]) -> List[str]:
+            # Tools may have side effects (book_appointment): a speculative stream only
+            # runs them once it is kept, and never if it is discarded.
+            await gate
+            return await self.execute_tools(tool_calls)
+        return execute
+
+    async def execute_tools(self, tool_calls: List[Dict]) -> List[str]:
+        """
+        Runs the tool calls of one LLM response concurrently; results keep the call order.
+        """
+        return await asyncio.gather(*(self._run_tool(call) for call in tool_calls))
+
+    async def _run_tool(self, call: Dict) -> str:
+        # The id is echoed back in the tool message, where the API rejects a null id.
+        if not call.get("id"):
+            call["id"] = f"call_{uuid.uuid4().hex[:24]}"
+        try:
+            arguments = json.loads(call["arguments"] or "{}")
+        except json.JSONDecodeError:
+            return json.dumps({"error": "invalid JSON arguments"})
+        # A prefetched result is only valid for the argument-less call it was started with.
+        prefetched = self._prefetched.pop(call["name"], None)
+        if prefetched is not None and not arguments:
+            TOOL_PREFETCH.inc(tool=call["name"], result="used")
+            return await prefetched
+        if prefetched is not None:
+            prefetched.cancel()
+            TOOL_PREFETCH.inc(tool=call["name"], result="discarded")
+        return await tool_registry.run(call["name"], arguments, self)
+
+    async def _speculate(self, text: str, node: BaseNode) -> Tuple[AsyncGenerator[str, None], BaseNode]:
+        """
+        Starts the LLM request with the current node's prompt while routing runs.
+        If routing moves the flow to another node, the speculative stream is cancelled
+        and generation restarts with that node's prompt. Tool calls the model makes in
+        the meantime wait for routing and only run if the speculation is kept.
+        """
+        start = time.perf_counter()
+        settled = asyncio.get_running_loop().create_future()
+        speculative = self._generate(node, text, tool_gate=settled)
+        first_chunk = asyncio.ensure_future(anext(speculative))
+        try:
+            transitioned_node = await self.check_router_transition(text)
+        except BaseException:
+            await self._discard(first_chunk, speculative)
+            raise
+
+        if transitioned_node is None:
+            SPECULATIONS.inc(outcome="hit")
+            settled.set_result(None)
+            SPECULATION_TTFT_SAVED.observe(time.perf_counter() - start)
+            return self._resume(first_chunk, speculative), node
+
+        SPECULATIONS.inc(outcome="miss")
+        await self._discard(first_chunk, speculative)
+        return self._generate(transitioned_node, text), transitioned_node
+
+    async def _resume(self, first_chunk: asyncio.Future, generator: AsyncGenerator[str, None]) -> AsyncGenerator[str, None]:
+        try:
+            try:
+                yield await first_chunk
+            except StopAsyncIteration:
+                return
+            async for chunk in generator:
+                yield chunk
+        finally:
+            await self._discard(first_chunk, generator)
+
+    @staticmethod
+    async def _discard(first_chunk: asyncio.Future, generator: AsyncGenerator[str, None]):
+        # Cancelling the pending read closes the upstream Groq stream inside the generator.
+        if not first_chunk.done():
+            first_chunk.cancel()
+        await asyncio.gather(first_chunk, return_exceptions=True)
+        await generator.aclose()
+
     async def check_router_transition(self, text: str) -> BaseNode | None:
         """
         Uses Semantic Router to determine if we should jump from Root to somewhere else.
         """
         # Only active in Root usually, or global interrupts like "Transfer"
-        # Global Interrupts:
-        route = await self.llm_service.router.check_route(text)
-        
-        if route == "human_handoff":
-            return TransferLogicNode()
-        
-        if isinstance(self.current_node, RootGreetingNode):
-            if route == "legal_issue_traffic":
-                return QualifyStartNode()
-            # If route == "pricing_info": return OfferAppointmentNode() # Maybe?
-            
-        return None
+        # The node declares which routes it listens to; with none, the router isn't queried.
+        route = await timed("route", self.llm_service.router.check_route(text, routes=self.current_node.routes))
+        trace = current_trace.get()
+        if trace is not None and route is not None:
+            trace.route = route
+
+        # Global interrupts (human_handoff) and node-specific jumps come from the flow graph.
+        return flow_graph.route_target(self.current_node, route)
 
     def check_post_interaction_transition(self, user_text: str, assistant_response: str):
         """
         Heuristic transition logic based on conversation state.
         Real implementation would use structured LLM outputs or specific classifiers.
         """
-        text_lower = user_text.lower()
-        
-        # Node B -> Node C or F (Location check)
-        if isinstance(self.current_node, QualifyStartNode):
-            # Keyword heuristics for demo
-            if "córdoba" in text_lower or "cordoba" in text_lower or "capital" in text_lower:
-                self.current_node = QualifyDetailsNode()
-            elif "buenos aires" in text_lower or "rosario" in text_lower or "lejos" in text_lower:
-                self.current_node = RejectionLocationNode()
-        
-        # Node C -> Node D (After user gives details)
-        elif isinstance(self.current_node, QualifyDetailsNode):
-            # Assume if user wrote a decent length message or mentioned "heridos", "auto", etc, we proceed.
-            # Simple counter: assume 1-2 turns. For now, immediate transition after 1 answer? 
-            # Prompt asked for 2 questions. Let's assume we stay 1 turn then move. 
-            # Hard to track turns without 'turn_count' in node. 
-            # Let's just move after any input for this demo, or specifically if length > 5 chars.
-            if len(user_text) > 3:
-                self.current_node = OfferAppointmentNode()
-
-        # Node D -> Node E (Booking)
-        elif isinstance(self.current_node, OfferAppointmentNode):
-            if any(x in text_lower for x in ["sí", "si", "quiero", "agendar", "cita"]):
-                self.current_node = BookingProcessNode()
+        next_node = flow_graph.match_transition(self.current_node, user_text)
+        if next_node is not None:
+            self.enter_node(next_node)
 
 class FlowManager:
     def __init__(self):
         self.router_service = RouterService()
         self.llm_service = SmartLLMService(router_service=self.router_service)
-        self.active_flows: Dict[str, FlowInstance] = {}
+        # The backend holds the authoritative session state (shared between workers for
+        # sqlite/redis); active_flows caches deserialized instances in this process.
+        self.backend = create_session_backend()
+        self.active_flows = SessionStore(
+            max_size=settings.SESSION_MAX_ACTIVE,
+            idle_ttl=settings.SESSION_IDLE_TTL,
+        )
+        self._sweeper: asyncio.Task | None = None
+        self.turns = TurnCoordinator()
+
+    async def get_or_create_flow(self, call_id: str) -> FlowInstance:
+        raw, version = await self.backend.load(call_id)
+        flow = self.active_flows.get(call_id)
+        # Reuse the cached instance unless another worker committed a newer turn.
+        if flow is not None and flow.version == version:
+            return flow
+        if raw is None:
+            flow = FlowInstance(call_id, self.llm_service)
+        else:
+            flow = FlowInstance.from_snapshot(call_id, self.llm_service, raw, version)
+        self.active_flows.put(call_id, flow)
+        return flow
+
+    async def save_flow(self, flow: FlowInstance, version: int | None = None):
+        """
+        Commits the flow's state. `version` is the one the turn loaded (default: the
+        flow's own); the save fails if anything else was committed since.
+        """
+        try:
+            flow.version = await self.backend.save(flow.call_id, flow.snapshot(), flow.version if version is None else version)
+        except SessionConflict:
+            # Another worker committed a turn for this call first; its state wins and
+            # the next turn reloads it from the backend.
+            print(f"Session conflict for call {flow.call_id}: discarding this turn's state")
+            self.active_flows.remove(flow.call_id, "conflict")
+
+    async def process_turn_stream(self, call_id: str, text: str, trace: TurnTrace | None = None) -> AsyncGenerator[str, None]:
+        """
+        Runs one turn for the call. A newer turn for the same call cancels this one.
+        """
+        async for chunk in self.turns.stream(call_id, lambda turn: self._run_turn(call_id, text, turn, trace)):
+            yield chunk
+
+    async def _run_turn(self, call_id: str, text: str, turn: Turn, trace: TurnTrace | None) -> AsyncGenerator[str, None]:
+        # Runs in the turn's own task: router and LLM timings are recorded on this trace.
+        current_trace.set(trace)
+        flow = await self.get_or_create_flow(call_id)
+        # The version this turn read, not whatever the shared instance holds when it saves.
+        version = flow.version
+        async for chunk in flow.process_input_stream(text):
+            yield chunk
+        # The flow committed its state; from here the turn must finish saving.
+        turn.committing = True
+        await self.save_flow(flow, version)
+
+    async def process_turn(self, call_id: str, text: str, trace: TurnTrace | None = None) -> str:
+        full_resp = ""
+        async for chunk in self.process_turn_stream(call_id, text, trace):
+            full_resp += chunk
+        return full_resp
+
+    async def end_flow(self, call_id: str) -> bool:
+        """
+        Releases the call's state once Vapi reports the call has ended.
+        """
+        await self.backend.delete(call_id)
+        return self.active_flows.end(call_id)
+
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(settings.SESSION_SWEEP_INTERVAL)
+            self.active_flows.sweep()
+            try:
+                await self.backend.purge_expired()
+            except Exception as e:
+                print(f"Session sweep error: {e}")
 
-    def get_or_create_flow(self, call_id: str) -> FlowInstance:
-        if call_id not in self.active_flows:
-            self.active_flows[call_id] = FlowInstance(call_id, self.llm_service)
-        return self.active_flows[call_id]
+    async def start(self):
+        await self.router_service.start()
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.get_running_loop().create_task(self._sweep_forever())
 
-flow_manager = FlowManager()
+    async def stop(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        await self.backend.close()
+        await self.llm_service.close()
+        await self.router_service.close()
@@ -1,35 +1,58 @@
 from langfuse import Langfuse
 from app.core.config import settings
-from typing import List, Dict, Any, Optional
-
-# Initializing Langfuse client
-langfuse = Langfuse(
-    secret_key=settings.LANGFUSE_SECRET_KEY,
-    public_key=settings.LANGFUSE_PUBLIC_KEY,
-    host=settings.LANGFUSE_HOST
+from app.flows.prompts import PromptCache
+from typing import List, Dict, Any, Optional, Tuple
+
+# Langfuse client, built on first use (at startup) rather than at import time
+_langfuse: Langfuse | None = None
+
+def get_langfuse() -> Langfuse:
+    global _langfuse
+    if _langfuse is None:
+        _langfuse = Langfuse(
+            secret_key=settings.LANGFUSE_SECRET_KEY,
+            public_key=settings.LANGFUSE_PUBLIC_KEY,
+            host=settings.LANGFUSE_HOST
+        )
+    return _langfuse
+
+def _fetch_langfuse_prompt(prompt_name: str) -> Tuple[str, int | None]:
+    # Bypass the SDK's own cache and retries: PromptCache decides when to refetch.
+    prompt = get_langfuse().get_prompt(prompt_name, cache_ttl_seconds=0, max_retries=0)
+    return prompt.compile(), prompt.version
+
+# Shared by every node: turns read prompts from memory, Langfuse is only hit in the background.
+prompt_cache = PromptCache(
+    fetch=_fetch_langfuse_prompt,
+    ttl=settings.LANGFUSE_PROMPT_TTL,
+    enabled=settings.LANGFUSE_PROMPTS_ENABLED,
 )
 
 class BaseNode:
+    # Filled in by FlowGraph when the flow is compiled:
+    # the semantic routes this node listens to (the router is skipped if none),
+    # the tool payload sent to the LLM, and the tools to prefetch.
+    routes: List[str] = []
+    tools: Optional[List[Dict[str, Any]]] = None
+    # Tools started in the background as soon as the flow enters this node
+    prefetch: List[str] = []
+    # "canned" or "cache": the node's first reply is served from the response cache
+    reply_policy: Optional[str] = None
+
     def __init__(self, name: str, functions: Optional[List[Dict[str, Any]]] = None):
         self.name = name
         self.functions = functions or []
 
+    @property
+    def prompt_name(self) -> str:
+        return f"{self.name.lower()}_system"
+
     def get_system_message(self):
         """
-        Fetches the system prompt from Langfuse. 
+        Returns the node's Langfuse prompt from the in-memory cache (never blocks on Langfuse),
+        or the default text when managed prompts are disabled or not fetched yet.
         """
-        prompt_name = f"{self.name.lower()}_system"
-        try:
-            # In a real app, ensure this doesn't block if Langfuse is slow
-            # prompt = langfuse.get_prompt(prompt_name)
-            # return prompt.compile()
-            
-            # Fallback/Simulation for Development without active Langfuse prompts
-            return self._get_default_prompt()
-            
-        except Exception as e:
-            print(f"Langfuse Warning: Could not fetch prompt '{prompt_name}'. Using default. Error: {e}")
-            return self._get_default_prompt()
+        return prompt_cache.get(self.prompt_name, self._get_default_prompt())
 
     def _get_default_prompt(self):
         return f"You are a useful assistant in the {self.name} state."
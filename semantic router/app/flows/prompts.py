@@ -0,0 +1,84 @@
+import asyncio
+import time
+from typing import Callable, Dict, Iterable, Tuple
+from app.core.metrics import Counter, Histogram
+
+PROMPT_FETCH_SECONDS = Histogram(
+    "prompt_fetch_seconds", "Langfuse prompt fetch latency", ("outcome",),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+PROMPT_STALENESS_SECONDS = Histogram(
+    "prompt_served_age_seconds", "Age of the cached prompt served to a turn",
+    buckets=(1, 10, 60, 300, 600, 1800, 3600),
+)
+PROMPT_LOOKUPS = Counter("prompt_cache_lookups_total", "System prompt lookups", ("result",))
+
+class PromptCache:
+    """
+    In-memory cache of compiled Langfuse prompts. Turns are always served from memory:
+    entries older than `ttl` are refreshed in the background (stale-while-revalidate),
+    and prompts that were never fetched fall back to the node's default text.
+    """
+    def __init__(self, fetch: Callable[[str], Tuple[str, int | None]], ttl: float, enabled: bool = True):
+        # fetch(prompt_name) -> (compiled text, version); blocking, runs in a thread
+        self.fetch = fetch
+        self.ttl = ttl
+        self.enabled = enabled
+        self._entries: Dict[str, Tuple[str, int | None, float]] = {}
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self._failed_at: Dict[str, float] = {}
+
+    def get(self, prompt_name: str, default: str) -> str:
+        if not self.enabled:
+            return default
+        entry = self._entries.get(prompt_name)
+        if entry is None:
+            PROMPT_LOOKUPS.inc(result="default")
+            self._schedule_refresh(prompt_name)
+            return default
+        text, _, fetched_at = entry
+        age = time.monotonic() - fetched_at
+        PROMPT_STALENESS_SECONDS.observe(age)
+        if age > self.ttl:
+            PROMPT_LOOKUPS.inc(result="stale")
+            self._schedule_refresh(prompt_name)
+        else:
+            PROMPT_LOOKUPS.inc(result="fresh")
+        return text
+
+    def version(self, prompt_name: str) -> int | None:
+        entry = self._entries.get(prompt_name)
+        return entry[1] if entry else None
+
+    def _schedule_refresh(self, prompt_name: str):
+        task = self._refreshing.get(prompt_name)
+        if task is not None and not task.done():
+            return
+        # Back off: don't retry on every turn while Langfuse is failing.
+        failed_at = self._failed_at.get(prompt_name)
+        if failed_at is not None and time.monotonic() - failed_at < self.ttl:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._refreshing[prompt_name] = loop.create_task(self.refresh(prompt_name))
+
+    async def refresh(self, prompt_name: str) -> bool:
+        start = time.perf_counter()
+        try:
+            text, version = await asyncio.to_thread(self.fetch, prompt_name)
+        except Exception as e:
+            PROMPT_FETCH_SECONDS.observe(time.perf_counter() - start, outcome="error")
+            print(f"Langfuse Warning: Could not fetch prompt '{prompt_name}'. Keeping cached/default. Error: {e}")
+            self._failed_at[prompt_name] = time.monotonic()
+            return False
+        PROMPT_FETCH_SECONDS.observe(time.perf_counter() - start, outcome="ok")
+        self._failed_at.pop(prompt_name, None)
+        self._entries[prompt_name] = (text, version, time.monotonic())
+        return True
+
+    async def preload(self, prompt_names: Iterable[str]):
+        if not self.enabled:
+            return
+        await asyncio.gather(*(self.refresh(name) for name in prompt_names))
@@ -0,0 +1,80 @@
+import re
+from typing import Any, Dict, Tuple
+from app.core.config import settings
+from app.core.metrics import Counter
+from app.flows.nodes import BaseNode, prompt_cache
+from app.services.route_cache import LRUCache, normalize_text
+
+RESPONSE_CACHE_LOOKUPS = Counter("response_cache_lookups_total", "Node reply cache lookups", ("node", "result"))
+RESPONSE_CACHE_SKIPPED = Counter("response_cache_skipped_total", "Generated replies not stored in the cache", ("node", "reason"))
+
+# Reply policies a node can declare in the flow definition ("reply": ...)
+CANNED = "canned"  # the first reply in the node is the same whatever the caller said
+CACHE = "cache"    # the first reply depends only on what the caller said
+REPLY_POLICIES = (CANNED, CACHE)
+
+class ResponseCache:
+    """
+    Cache of the first reply a node gives after the flow enters it, for nodes whose
+    answer is (nearly) the same on every call. Keys are the node, its prompt version
+    (a new Langfuse version makes the old entries unreachable) and, for "cache" nodes,
+    the caller's normalized text. Such replies are generated from the system prompt and
+    the input only, never from the call's history or pinned FlowInstance.data, so the
+    key covers everything the model saw.
+    """
+    def __init__(self, max_size: int, ttl: float, enabled: bool = True):
+        self.entries = LRUCache(max_size, ttl)
+        self.enabled = enabled
+
+    def key(self, node: BaseNode, text: str) -> Tuple[Any, ...] | None:
+        """
+        Cache key for `node`'s reply to `text`, or None if the node's replies aren't cached.
+        """
+        if not self.enabled or node.reply_policy is None:
+            return None
+        version = prompt_cache.version(node.prompt_name)
+        if node.reply_policy == CANNED:
+            return (node.name, version)
+        return (node.name, version, normalize_text(text))
+
+    def get(self, node: BaseNode, key: Tuple[Any, ...]) -> str | None:
+        reply = self.entries.get(key)
+        RESPONSE_CACHE_LOOKUPS.inc(node=node.name, result="miss" if reply is None else "hit")
+        return reply
+
+    def put(self, node: BaseNode, key: Tuple[Any, ...], reply: str, data: Dict[str, Any], failed: bool = False) -> bool:
+        """
+        Stores a reply that ran to completion, unless it is an error fallback or it
+        repeats something gathered for this call (which would leak into other calls).
+        """
+        reason = None
+        if failed or not reply.strip():
+            reason = "error"
+        elif self._mentions_data(reply, data):
+            reason = "data"
+        if reason is not None:
+            RESPONSE_CACHE_SKIPPED.inc(node=node.name, reason=reason)
+            return False
+        self.entries.put(key, reply)
+        return True
+
+    @staticmethod
+    def _mentions_data(reply: str, data: Dict[str, Any]) -> bool:
+        normalized = normalize_text(reply)
+        for value in data.values():
+            if isinstance(value, (str, int, float)):
+                term = normalize_text(str(value))
+                if term and re.search(rf"\b{re.escape(term)}\b", normalized):
+                    return True
+        return False
+
+    def hit_rate(self, node: str) -> float:
+        hits = RESPONSE_CACHE_LOOKUPS.value(node=node, result="hit")
+        total = hits + RESPONSE_CACHE_LOOKUPS.value(node=node, result="miss")
+        return hits / total if total else 0.0
+
+response_cache = ResponseCache(
+    max_size=settings.RESPONSE_CACHE_MAX_SIZE,
+    ttl=settings.RESPONSE_CACHE_TTL,
+    enabled=settings.RESPONSE_CACHE_ENABLED,
+)
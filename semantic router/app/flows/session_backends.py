@@ -0,0 +1,198 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Tuple
+from app.core.config import settings
+
+class SessionConflict(Exception):
+    """
+    Raised when a snapshot is saved against a version that is no longer current,
+    i.e. another worker committed a turn for the same call in between.
+    """
+
+class SessionBackend:
+    """
+    Shared storage for serialized FlowInstance snapshots.
+    Every save is a compare-and-set on the version number (0 = not stored yet).
+    """
+    async def load(self, call_id: str) -> Tuple[bytes | None, int]:
+        raise NotImplementedError
+
+    async def save(self, call_id: str, data: bytes, expected_version: int) -> int:
+        """
+        Stores `data` if the stored version still equals `expected_version`.
+        Returns the new version, raises SessionConflict otherwise.
+        """
+        raise NotImplementedError
+
+    async def delete(self, call_id: str):
+        raise NotImplementedError
+
+    async def purge_expired(self):
+        pass
+
+    async def close(self):
+        pass
+
+class InMemorySessionBackend(SessionBackend):
+    """
+    Single-process backend (the default). Bounded by size and idle TTL like the local cache.
+    """
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[bytes, int, float]]" = OrderedDict()
+
+    async def load(self, call_id: str) -> Tuple[bytes | None, int]:
+        entry = self._entries.get(call_id)
+        if entry is None:
+            return None, 0
+        data, version, updated_at = entry
+        if time.monotonic() - updated_at > self.ttl:
+            del self._entries[call_id]
+            return None, 0
+        return data, version
+
+    async def save(self, call_id: str, data: bytes, expected_version: int) -> int:
+        _, current_version = await self.load(call_id)
+        if current_version != expected_version:
+            raise SessionConflict(call_id)
+        self._entries[call_id] = (data, current_version + 1, time.monotonic())
+        self._entries.move_to_end(call_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return current_version + 1
+
+    async def delete(self, call_id: str):
+        self._entries.pop(call_id, None)
+
+    async def purge_expired(self):
+        cutoff = time.monotonic() - self.ttl
+        expired = [call_id for call_id, (_, _, updated_at) in self._entries.items() if updated_at < cutoff]
+        for call_id in expired:
+            del self._entries[call_id]
+
+class SQLiteSessionBackend(SessionBackend):
+    """
+    File-backed backend shared by every worker on the same host (WAL mode).
+    Queries run in a thread so the event loop never waits on disk.
+    """
+    def __init__(self, path: str, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS flow_sessions ("
+            "call_id TEXT PRIMARY KEY, version INTEGER NOT NULL, data BLOB NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def _execute(self, query: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.execute(query, params)
+
+    def _load(self, call_id: str) -> Tuple[bytes | None, int]:
+        row = self._execute(
+            "SELECT data, version FROM flow_sessions WHERE call_id = ? AND updated_at >= ?",
+            (call_id, time.time() - self.ttl),
+        ).fetchone()
+        return (row[0], row[1]) if row else (None, 0)
+
+    def _save(self, call_id: str, data: bytes, expected_version: int) -> int:
+        now = time.time()
+        if expected_version == 0:
+            # New session: insert, or take over a row that already expired.
+            cursor = self._execute(
+                "INSERT INTO flow_sessions (call_id, version, data, updated_at) VALUES (?, 1, ?, ?) "
+                "ON CONFLICT(call_id) DO UPDATE SET version = 1, data = excluded.data, updated_at = excluded.updated_at "
+                "WHERE flow_sessions.updated_at < ?",
+                (call_id, data, now, now - self.ttl),
+            )
+        else:
+            cursor = self._execute(
+                "UPDATE flow_sessions SET version = version + 1, data = ?, updated_at = ? "
+                "WHERE call_id = ? AND version = ?",
+                (data, now, call_id, expected_version),
+            )
+        if cursor.rowcount != 1:
+            raise SessionConflict(call_id)
+        return expected_version + 1
+
+    async def load(self, call_id: str) -> Tuple[bytes | None, int]:
+        return await asyncio.to_thread(self._load, call_id)
+
+    async def save(self, call_id: str, data: bytes, expected_version: int) -> int:
+        return await asyncio.to_thread(self._save, call_id, data, expected_version)
+
+    async def delete(self, call_id: str):
+        await asyncio.to_thread(self._execute, "DELETE FROM flow_sessions WHERE call_id = ?", (call_id,))
+
+    async def purge_expired(self):
+        await asyncio.to_thread(
+            self._execute, "DELETE FROM flow_sessions WHERE updated_at < ?", (time.time() - self.ttl,)
+        )
+
+    async def close(self):
+        self._conn.close()
+
+# Compare-and-set executed atomically on the Redis server.
+_REDIS_SAVE_SCRIPT = """
+local current = tonumber(redis.call('HGET', KEYS[1], 'v') or '0')
+if current ~= tonumber(ARGV[1]) then
+  return -1
+end
+redis.call('HSET', KEYS[1], 'v', current + 1, 'd', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return current + 1
+"""
+
+class RedisSessionBackend(SessionBackend):
+    """
+    Network backend shared by every worker and replica (Redis or any compatible server).
+    Expiry is handled by Redis key TTLs.
+    """
+    def __init__(self, url: str, ttl: float, key_prefix: str = "flow_session:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise ImportError(
+                "Please install 'redis' to use the redis session backend. "
+                "You can install it with: `pip install redis`"
+            ) from e
+        self.ttl = int(ttl)
+        self.key_prefix = key_prefix
+        self._client = redis.from_url(url)
+        self._save_script = self._client.register_script(_REDIS_SAVE_SCRIPT)
+
+    async def load(self, call_id: str) -> Tuple[bytes | None, int]:
+        version, data = await self._client.hmget(self.key_prefix + call_id, "v", "d")
+        if data is None:
+            return None, 0
+        return data, int(version)
+
+    async def save(self, call_id: str, data: bytes, expected_version: int) -> int:
+        new_version = await self._save_script(
+            keys=[self.key_prefix + call_id], args=[expected_version, data, self.ttl]
+        )
+        if new_version < 0:
+            raise SessionConflict(call_id)
+        return new_version
+
+    async def delete(self, call_id: str):
+        await self._client.delete(self.key_prefix + call_id)
+
+    async def close(self):
+        await self._client.aclose()
+
+def create_session_backend() -> SessionBackend:
+    backend = settings.SESSION_BACKEND
+    if backend == "memory":
+        return InMemorySessionBackend(ttl=settings.SESSION_IDLE_TTL, max_size=settings.SESSION_MAX_ACTIVE)
+    if backend == "sqlite":
+        return SQLiteSessionBackend(settings.SESSION_SQLITE_PATH, ttl=settings.SESSION_IDLE_TTL)
+    if backend == "redis":
+        return RedisSessionBackend(settings.SESSION_REDIS_URL, ttl=settings.SESSION_IDLE_TTL)
+    raise ValueError(f"Unknown SESSION_BACKEND '{backend}' (expected memory, sqlite or redis)")
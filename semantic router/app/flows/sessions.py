@@ -0,0 +1,77 @@
+import time
+from collections import OrderedDict
+from typing import Any, Tuple
+from app.core.metrics import Counter, Gauge
+
+SESSIONS_LIVE = Gauge("flow_sessions_live", "FlowInstances currently held in memory")
+SESSIONS_EVICTED = Counter("flow_sessions_evicted_total", "FlowInstances removed from memory", ("reason",))
+
+class SessionStore:
+    """
+    Process-local store of FlowInstances keyed by call_id.
+    Entries are dropped when the call ends, after `idle_ttl` seconds without a turn,
+    or least-recently-used first once `max_size` is exceeded.
+    """
+    def __init__(self, max_size: int, idle_ttl: float):
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self._sessions: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, call_id: str):
+        return call_id in self._sessions
+
+    def get(self, call_id: str) -> Any | None:
+        entry = self._sessions.get(call_id)
+        if entry is None:
+            return None
+        flow, last_seen = entry
+        now = time.monotonic()
+        if now - last_seen > self.idle_ttl:
+            self._evict(call_id, "idle")
+            return None
+        self._sessions[call_id] = (flow, now)
+        self._sessions.move_to_end(call_id)
+        return flow
+
+    def put(self, call_id: str, flow: Any):
+        self._sessions[call_id] = (flow, time.monotonic())
+        self._sessions.move_to_end(call_id)
+        while len(self._sessions) > self.max_size:
+            oldest = next(iter(self._sessions))
+            self._evict(oldest, "lru")
+        SESSIONS_LIVE.set(len(self._sessions))
+
+    def end(self, call_id: str) -> bool:
+        """
+        Explicit end-of-call cleanup. Returns False if the call was not in memory.
+        """
+        return self.remove(call_id, "ended")
+
+    def remove(self, call_id: str, reason: str) -> bool:
+        if call_id not in self._sessions:
+            return False
+        self._evict(call_id, reason)
+        return True
+
+    def sweep(self) -> int:
+        """
+        Drops every session idle for longer than `idle_ttl`. Returns how many were removed.
+        """
+        cutoff = time.monotonic() - self.idle_ttl
+        # Entries are kept in last-seen order, so the expired ones are at the front.
+        expired = []
+        for call_id, (_, last_seen) in self._sessions.items():
+            if last_seen > cutoff:
+                break
+            expired.append(call_id)
+        for call_id in expired:
+            self._evict(call_id, "idle")
+        return len(expired)
+
+    def _evict(self, call_id: str, reason: str):
+        del self._sessions[call_id]
+        SESSIONS_EVICTED.inc(reason=reason)
+        SESSIONS_LIVE.set(len(self._sessions))
@@ -0,0 +1,73 @@
+import asyncio
+from typing import AsyncGenerator, Callable, Dict
+from app.core.metrics import Counter
+
+TURNS_CANCELLED = Counter("flow_turns_cancelled_total", "Turns stopped before completing", ("reason",))
+
+_DONE = object()
+
+class Turn:
+    def __init__(self, previous: "Turn | None" = None):
+        self.task: asyncio.Task | None = None
+        # Set once the turn has finished generating and is writing its state;
+        # from then on it is awaited instead of cancelled.
+        self.committing = False
+        # The turn this one superseded; it has to stop before this one reads the flow.
+        self.previous = previous
+
+class TurnCoordinator:
+    """
+    Serializes the turns of each call. A newer turn for the same call cancels the one
+    in flight (barge-in), including its upstream LLM stream, and waits for it to stop
+    before it reads the flow state, so only one turn ever commits at a time. A turn is
+    registered before it waits, so each newcomer supersedes the latest turn, however
+    many arrive while one is still committing.
+    """
+    def __init__(self):
+        self._turns: Dict[str, Turn] = {}
+
+    async def stream(self, call_id: str, run_turn: Callable[[Turn], AsyncGenerator[str, None]]) -> AsyncGenerator[str, None]:
+        previous = self._turns.get(call_id)
+        if previous is not None and not previous.task.done() and not previous.committing:
+            previous.task.cancel()
+            TURNS_CANCELLED.inc(reason="barge_in")
+
+        # Nothing is awaited between reading and replacing the latest turn.
+        turn = Turn(previous)
+        queue: asyncio.Queue = asyncio.Queue()
+        turn.task = asyncio.get_running_loop().create_task(self._pump(turn, run_turn, queue))
+        self._turns[call_id] = turn
+        turn.task.add_done_callback(lambda _: self._forget(call_id, turn))
+        # Also runs for a turn cancelled before its task ever started.
+        turn.task.add_done_callback(lambda _: queue.put_nowait(_DONE))
+        try:
+            while True:
+                chunk = await queue.get()
+                if chunk is _DONE:
+                    break
+                yield chunk
+            await asyncio.wait({turn.task})
+            if not turn.task.cancelled():
+                # Surface errors raised by the turn itself; a superseded turn just ends its stream.
+                turn.task.result()
+        finally:
+            if not turn.task.done() and not turn.committing:
+                # The consumer went away (client disconnected): stop paying for the generation.
+                turn.task.cancel()
+                TURNS_CANCELLED.inc(reason="disconnect")
+
+    def _forget(self, call_id: str, turn: Turn):
+        if self._turns.get(call_id) is turn:
+            del self._turns[call_id]
+
+    async def _pump(self, turn: Turn, run_turn: Callable[[Turn], AsyncGenerator[str, None]], queue: asyncio.Queue):
+        # Runs the turn in its own task so it can be cancelled from another request.
+        # A superseded turn may stop while still waiting, before its own predecessor
+        # finished committing: wait for the whole chain, never cancelling it from here.
+        previous = turn.previous
+        while previous is not None:
+            await asyncio.wait({previous.task})
+            previous = previous.previous
+        turn.previous = None
+        async for chunk in run_turn(turn):
+            queue.put_nowait(chunk)
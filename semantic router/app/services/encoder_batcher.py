@@ -0,0 +1,116 @@
+import asyncio
+from concurrent.futures import Executor
+from typing import Callable, List, Tuple
+from app.core.metrics import Counter, Histogram
+
+ENCODER_BATCH_SIZE = Histogram(
+    "router_encoder_batch_size", "Texts encoded per encoder forward pass",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+ENCODER_QUEUE_WAIT = Histogram(
+    "router_encoder_queue_wait_seconds", "Time a text waited in the batching queue before encoding",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+ENCODER_BATCH_ERRORS = Counter("router_encoder_batch_errors_total", "Encoder batches that raised")
+
+class EncoderBatcher:
+    """
+    Collects concurrent encode requests for up to `max_wait_ms` or `max_batch_size` texts,
+    runs a single encoder forward pass for the batch and hands each caller its own vector.
+    """
+    def __init__(
+        self,
+        encode_batch: Callable[[List[str]], List[List[float]]],
+        executor: Executor,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+    ):
+        self.encode_batch = encode_batch
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        # In-flight batches; holding them keeps them from being garbage-collected mid-encode.
+        self._batches: set[asyncio.Task] = set()
+
+    async def encode(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._collect())
+        future = loop.create_future()
+        self._queue.put_nowait((text, future, loop.time()))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            try:
+                while len(batch) < self.max_batch_size:
+                    if not self._queue.empty():
+                        batch.append(self._queue.get_nowait())
+                        continue
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+            except asyncio.CancelledError:
+                for _, future, _ in batch:
+                    future.cancel()
+                raise
+            # Encode in the background so the next batch can be collected meanwhile;
+            # concurrency is bounded by the executor size.
+            task = loop.create_task(self._encode(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _encode(self, batch: List[Tuple[str, asyncio.Future, float]]):
+        loop = asyncio.get_running_loop()
+        # Callers that gave up (cancelled turn) don't need a vector.
+        batch = [item for item in batch if not item[1].done()]
+        if not batch:
+            return
+
+        now = loop.time()
+        for _, _, enqueued_at in batch:
+            ENCODER_QUEUE_WAIT.observe(now - enqueued_at)
+        ENCODER_BATCH_SIZE.observe(len(batch))
+
+        texts = [text for text, _, _ in batch]
+        try:
+            vectors = await loop.run_in_executor(self.executor, self.encode_batch, texts)
+        except asyncio.CancelledError:
+            # Closed mid-encode: callers are cancelled rather than left waiting forever.
+            for _, future, _ in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            ENCODER_BATCH_ERRORS.inc()
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+    async def close(self):
+        tasks = list(self._batches)
+        if self._worker is not None:
+            self._worker.cancel()
+            tasks.append(self._worker)
+            self._worker = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Texts still queued never reach a batch.
+        while self._queue is not None and not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            future.cancel()
@@ -0,0 +1,152 @@
+import json
+import os
+import re
+from typing import List
+import numpy as np
+from semantic_router.encoders import HuggingFaceEncoder
+from app.core.config import settings
+
+def onnx_model_dir(model_name: str) -> str:
+    return os.path.join(settings.ROUTER_ONNX_DIR, re.sub(r"[^\w.-]+", "__", model_name))
+
+def onnx_model_file(model_dir: str, quantize: bool) -> str:
+    return os.path.join(model_dir, "model.int8.onnx" if quantize else "model.onnx")
+
+def ensure_onnx_export(model_name: str, quantize: bool = True) -> str:
+    """
+    Exports the model unless it already is; returns its directory. Build time only
+    (seed_router.py): the server never exports.
+    """
+    model_dir = onnx_model_dir(model_name)
+    if not os.path.exists(onnx_model_file(model_dir, quantize)):
+        print(f"Encoder: exporting {model_name} to ONNX in {model_dir}")
+        export_onnx(model_name, model_dir, quantize=quantize)
+    return model_dir
+
+def export_onnx(model_name: str, output_dir: str, quantize: bool = True):
+    """
+    One-time export of a HuggingFace sentence encoder to ONNX (plus a dynamically
+    int8-quantized copy). Needs torch and transformers; serving the result doesn't.
+    """
+    try:
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+    except ImportError as e:
+        raise ImportError(
+            "Please install torch and transformers to export the ONNX encoder. "
+            "You can install them with: `pip install -r requirements-onnx-export.txt`"
+        ) from e
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+
+    sample = tokenizer(["hola, buenos días"], return_tensors="pt")
+    input_names = list(sample.keys())
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            os.path.join(output_dir, "model.onnx"),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+        )
+    # The fast tokenizer's tokenizer.json is all the runtime needs.
+    tokenizer.save_pretrained(output_dir)
+    with open(os.path.join(output_dir, "encoder.json"), "w") as f:
+        json.dump({
+            "model": model_name,
+            "max_length": min(tokenizer.model_max_length, 512),
+            "pad_token": tokenizer.pad_token,
+            "pad_id": tokenizer.pad_token_id,
+        }, f)
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(
+            os.path.join(output_dir, "model.onnx"),
+            os.path.join(output_dir, "model.int8.onnx"),
+            weight_type=QuantType.QInt8,
+        )
+
+class OnnxEncoder:
+    """
+    Same sentence encoder as HuggingFaceEncoder (mean pooling, L2-normalized), run by
+    onnxruntime with a `tokenizers` fast tokenizer: no torch at serving time, a fraction
+    of the memory, and optionally int8 weights. The model has to be exported at build
+    time (`python seed_router.py --export-only`); a missing model is an error here.
+    """
+    score_threshold = 0.5
+
+    def __init__(self, model_name: str, model_dir: str | None = None, quantize: bool = True, threads: int = 0):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError(
+                "Please install onnxruntime and tokenizers to use the onnx encoder backend. "
+                "You can install them with: `pip install -r requirements-onnx.txt`"
+            ) from e
+
+        model_dir = model_dir or onnx_model_dir(model_name)
+        model_file = onnx_model_file(model_dir, quantize)
+        if not os.path.exists(model_file):
+            # Exporting needs torch/transformers, which the serving image doesn't have.
+            raise FileNotFoundError(
+                f"ONNX encoder for {model_name} not found at {model_file}. Export it at build time "
+                "with `python seed_router.py --export-only` (ROUTER_ENCODER_BACKEND=onnx, same "
+                "ROUTER_ONNX_DIR and ROUTER_ONNX_QUANTIZE as the server)."
+            )
+
+        with open(os.path.join(model_dir, "encoder.json")) as f:
+            config = json.load(f)
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=config["max_length"])
+        self.tokenizer.enable_padding(pad_id=config["pad_id"], pad_token=config["pad_token"])
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        # Parallelism comes from the encoder pool; each call gets a fixed slice of the cores.
+        options.intra_op_num_threads = threads or max(1, (os.cpu_count() or 1) // settings.ROUTER_ENCODER_WORKERS)
+        options.inter_op_num_threads = 1
+        # Don't burn idle cores spinning between turns.
+        options.add_session_config_entry("session.intra_op.allow_spinning", "0")
+        self.session = ort.InferenceSession(model_file, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        # Part of each utterance's content hash, so seeding re-embeds when the backend changes.
+        self.name = f"{model_name}@onnx{'-int8' if quantize else ''}"
+
+    def __call__(self, docs: List[str]) -> List[List[float]]:
+        encodings = self.tokenizer.encode_batch(docs)
+        inputs = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {name: inputs[name] for name in self.input_names})[0]
+
+        mask = inputs["attention_mask"][..., None].astype(np.float32)
+        embeddings = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings.tolist()
+
+def create_encoder(backend: str | None = None):
+    """
+    The routing encoder selected by ROUTER_ENCODER_BACKEND ("torch" or "onnx").
+    Seeding and serving must use the same backend.
+    """
+    backend = backend or settings.ROUTER_ENCODER_BACKEND
+    if backend == "torch":
+        return HuggingFaceEncoder(name=settings.ROUTER_ENCODER_MODEL)
+    if backend == "onnx":
+        return OnnxEncoder(
+            settings.ROUTER_ENCODER_MODEL,
+            quantize=settings.ROUTER_ONNX_QUANTIZE,
+            threads=settings.ROUTER_ONNX_THREADS,
+        )
+    raise ValueError(f"Unknown ROUTER_ENCODER_BACKEND '{backend}' (expected torch or onnx)")
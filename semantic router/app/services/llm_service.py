@@ -1,50 +1,281 @@
+import asyncio
 import os
-from groq import Groq
+import random
+import time
+import httpx
+from groq import Groq, AsyncGroq, APIConnectionError, InternalServerError, RateLimitError
+from app.core.admission import Overloaded, groq_limit
 from app.core.config import settings
+from app.core.metrics import Counter
+from app.core.tracing import current_trace
 from app.services.router_service import RouterService
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Awaitable, Callable, Dict, List, Tuple
+
+LLM_HEDGES = Counter("llm_hedges_total", "Hedged Groq requests (fired, then won or lost by the hedge; skipped without a free slot)", ("outcome",))
+LLM_RETRIES = Counter("llm_retries_total", "Groq requests retried after a transient error", ("error",))
+
+# Spoken when the request fails; never worth caching
+ERROR_REPLY = "Lo siento, tuve un problema procesando tu solicitud."
+
+# Executes the tool calls of one LLM response (concurrently) and returns one result string per call
+ToolExecutor = Callable[[List[Dict]], Awaitable[List[str]]]
 
 class SmartLLMService:
     def __init__(self, router_service: RouterService):
-        self.client = Groq(api_key=settings.GROQ_API_KEY)
+        self.client = Groq(api_key=settings.GROQ_API_KEY, base_url=settings.GROQ_BASE_URL)
         self.router = router_service
         self.model = settings.GROQ_MODEL
 
-    async def get_response_stream(self, text: str, system_message: str, history: list = None, tools: list = None) -> AsyncGenerator[str, None]:
-        """
-        Yields chunks of text from Groq.
-        """
+        # Shared keep-alive connection pool for the async client, reused by every call.
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.GROQ_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.GROQ_MAX_CONNECTIONS,
+                keepalive_expiry=settings.GROQ_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(
+                settings.GROQ_READ_TIMEOUT,
+                connect=settings.GROQ_CONNECT_TIMEOUT,
+            ),
+        )
+        self.async_client = AsyncGroq(
+            api_key=settings.GROQ_API_KEY,
+            base_url=settings.GROQ_BASE_URL,
+            http_client=self.http_client,
+            # Retries are done by _stream_round, with a backoff sized for a live call.
+            max_retries=0,
+        )
+        self.use_async = settings.GROQ_ASYNC
+
+    def _build_request(self, text: str, system_message: str, history: list = None, tools: list = None) -> dict:
         messages = [{"role": "system", "content": system_message}]
         if history:
             messages.extend(history)
-        
+
         messages.append({"role": "user", "content": text})
 
+        # Prepare args
+        kwargs = {
+            "messages": messages,
+            "model": self.model,
+            "temperature": 0.7,
+            "stream": True,
+        }
+        if tools:
+            kwargs["tools"] = tools
+            kwargs["tool_choice"] = "auto"
+        return kwargs
+
+    async def get_response_stream(self, text: str, system_message: str, history: list = None, tools: list = None, tool_executor: ToolExecutor = None) -> AsyncGenerator[str, None]:
+        """
+        Yields chunks of text from Groq.
+        If the model calls tools and a `tool_executor` is given, the calls are run and their
+        results fed back in a continuation request whose text is streamed as well.
+        """
+        kwargs = self._build_request(text, system_message, history, tools)
+        stream_fn = self._stream_round if self.use_async else self._stream_sync
+        start = time.perf_counter()
+        first_token = None
+
         try:
-            # Prepare args
-            kwargs = {
-                "messages": messages,
-                "model": self.model,
-                "temperature": 0.7,
-                "stream": True,
-            }
-            if tools:
-                kwargs["tools"] = tools
-                kwargs["tool_choice"] = "auto"
-
-            stream = self.client.chat.completions.create(**kwargs)
-            
-            for chunk in stream:
-                # Simple handling: yield text content. 
-                # If tool_calls are present, we might want to handle them differently in future.
-                # For now, we focus on speech output.
-                if chunk.choices[0].delta.content is not None:
-                    yield chunk.choices[0].delta.content
-                # NOTE: If we want to support tool executions, we need to capture tool_calls here,
-                # execute them, and feed back to the LLM (internal loop) OR pass them downstream.
+            for tool_round in range(settings.LLM_MAX_TOOL_ROUNDS + 1):
+                tool_calls: List[Dict] = []
+                async with groq_limit.slot():
+                    async for content in stream_fn(kwargs, tool_calls):
+                        if first_token is None:
+                            first_token = time.perf_counter()
+                        yield content
+                if not tool_calls or tool_executor is None:
+                    break
+
+                results = await tool_executor(tool_calls)
+                kwargs["messages"] = kwargs["messages"] + [
+                    {"role": "assistant", "content": None, "tool_calls": [
+                        {"id": call["id"], "type": "function",
+                         "function": {"name": call["name"], "arguments": call["arguments"]}}
+                        for call in tool_calls
+                    ]},
+                ] + [
+                    {"role": "tool", "tool_call_id": call["id"], "content": result}
+                    for call, result in zip(tool_calls, results)
+                ]
+                if tool_round + 1 >= settings.LLM_MAX_TOOL_ROUNDS:
+                    # Last continuation: the model has to answer in words.
+                    kwargs.pop("tools", None)
+                    kwargs.pop("tool_choice", None)
+
+            # Only streams that ran to the end are timed (not discarded speculations).
+            trace = current_trace.get()
+            if trace is not None:
+                if first_token is not None:
+                    trace.add("llm_ttft", first_token - start)
+                trace.add("llm_total", time.perf_counter() - start)
+        except Overloaded:
+            # Not an upstream error: the caller answers with the "busy" fallback.
+            raise
         except Exception as e:
             print(f"Groq API Error: {e}")
-            yield "Lo siento, tuve un problema procesando tu solicitud."
+            yield ERROR_REPLY
+
+    async def _stream_round(self, kwargs: dict, tool_calls: List[Dict]) -> AsyncGenerator[str, None]:
+        """
+        One request/response round: retries transient errors until the first token with
+        exponential backoff, hedges a slow first token (_race), then streams the winner.
+        """
+        for attempt in range(settings.LLM_RETRY_ATTEMPTS + 1):
+            try:
+                first, generator, calls = await self._race(kwargs)
+                break
+            except Exception as e:
+                if attempt >= settings.LLM_RETRY_ATTEMPTS or not self._is_transient(e):
+                    raise
+                LLM_RETRIES.inc(error=type(e).__name__)
+                await asyncio.sleep(settings.LLM_RETRY_BACKOFF_MS / 1000 * 2 ** attempt * random.uniform(0.5, 1.0))
+
+        try:
+            # StopAsyncIteration: the response had no text (tool calls only).
+            if first.exception() is None:
+                yield first.result()
+                async for content in generator:
+                    yield content
+            tool_calls.extend(calls)
+        finally:
+            await generator.aclose()
+
+    async def _race(self, kwargs: dict) -> Tuple[asyncio.Future, AsyncGenerator[str, None], List[Dict]]:
+        """
+        Starts the request and waits for its first chunk. If none has arrived after
+        LLM_HEDGE_AFTER_MS, a second request (LLM_HEDGE_MODEL) is fired; whichever answers
+        first wins and the other is cancelled. A hedge needs a free Groq slot of its own
+        (it never queues), held while both requests are open.
+        Returns the winner's first-chunk future, its stream and its tool-call accumulator.
+        """
+        loop = asyncio.get_running_loop()
+        attempts: Dict[asyncio.Future, Tuple[AsyncGenerator[str, None], List[Dict], str]] = {}
+
+        def launch(label: str, request: dict):
+            calls: List[Dict] = []
+            generator = self._stream_async(request, calls)
+            attempts[asyncio.ensure_future(anext(generator))] = (generator, calls, label)
+
+        launch("primary", kwargs)
+        hedge_at = loop.time() + settings.LLM_HEDGE_AFTER_MS / 1000 if settings.LLM_HEDGE_AFTER_MS > 0 else None
+        winner = None
+        error: BaseException | None = None
+        hedge_slot = False
+        try:
+            while winner is None:
+                pending = [first for first in attempts if not first.done()]
+                if not pending:
+                    raise error
+                timeout = max(0.0, hedge_at - loop.time()) if hedge_at is not None else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for first in done:
+                    exc = first.exception()
+                    if exc is None or isinstance(exc, StopAsyncIteration):
+                        winner = first
+                        break
+                    error = exc
+                if winner is None and not done and hedge_at is not None:
+                    hedge_at = None
+                    hedge_slot = groq_limit.try_acquire()
+                    if hedge_slot:
+                        launch("hedge", {**kwargs, "model": settings.LLM_HEDGE_MODEL or kwargs["model"]})
+                        LLM_HEDGES.inc(outcome="fired")
+                    else:
+                        LLM_HEDGES.inc(outcome="skipped")
+        finally:
+            for first, (generator, _, _) in attempts.items():
+                if first is not winner:
+                    # Cancelling the pending read closes that request's HTTP stream.
+                    first.cancel()
+                    await asyncio.gather(first, return_exceptions=True)
+                    await generator.aclose()
+            if hedge_slot:
+                # One request is left open, and it streams under the round's own slot.
+                groq_limit.release()
+
+        generator, calls, label = attempts[winner]
+        if len(attempts) > 1:
+            LLM_HEDGES.inc(outcome="won" if label == "hedge" else "lost")
+        return winner, generator, calls
+
+    @staticmethod
+    def _is_transient(error: Exception) -> bool:
+        # Connection drops, timeouts, 429 and 5xx; bad requests and auth errors are not retried.
+        return isinstance(error, (APIConnectionError, InternalServerError, RateLimitError, httpx.TransportError))
+
+    async def _stream_async(self, kwargs: dict, tool_calls: List[Dict]) -> AsyncGenerator[str, None]:
+        """
+        Streams over the pooled async client; the event loop stays free between chunks.
+        Tool-call deltas are assembled into `tool_calls` as they arrive.
+        """
+        stream = await self.async_client.chat.completions.create(**kwargs)
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.content is not None:
+                    yield delta.content
+                if delta.tool_calls:
+                    self._accumulate_tool_calls(tool_calls, delta.tool_calls)
+        finally:
+            # Release the connection back to the pool even if the consumer stops early.
+            await stream.close()
+
+    @staticmethod
+    def _accumulate_tool_calls(tool_calls: List[Dict], deltas: list):
+        # Deltas carry an index; id and name come first, arguments may arrive in pieces.
+        for delta in deltas:
+            while len(tool_calls) <= delta.index:
+                tool_calls.append({"id": None, "name": "", "arguments": ""})
+            call = tool_calls[delta.index]
+            if delta.id:
+                call["id"] = delta.id
+            if delta.function is not None:
+                if delta.function.name:
+                    call["name"] += delta.function.name
+                if delta.function.arguments:
+                    call["arguments"] += delta.function.arguments
+
+    async def _stream_sync(self, kwargs: dict, tool_calls: List[Dict]) -> AsyncGenerator[str, None]:
+        """
+        Legacy path over the blocking client (GROQ_ASYNC=False). Text only, tools are not executed.
+        """
+        stream = self.client.chat.completions.create(**kwargs)
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content is not None:
+                yield chunk.choices[0].delta.content
+
+    async def warmup(self):
+        """
+        Opens a pooled connection to Groq (DNS, TLS) before the first call needs it.
+        """
+        await self.async_client.models.list()
+
+    async def summarize(self, messages: list, previous_summary: str = "") -> str:
+        """
+        Condenses older turns (plus the previous summary) into a short rolling summary.
+        Runs off the hot path, on a smaller model.
+        """
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        if previous_summary:
+            transcript = f"Resumen previo: {previous_summary}\n{transcript}"
+        async with groq_limit.slot():
+            completion = await self.async_client.chat.completions.create(
+                model=settings.HISTORY_SUMMARY_MODEL,
+                messages=[
+                    {"role": "system", "content": (
+                        "Resume la conversación entre la recepcionista y el usuario en 3 frases como máximo. "
+                        "Conserva nombres, localidades, fechas y detalles del caso. Responde solo con el resumen."
+                    )},
+                    {"role": "user", "content": transcript},
+                ],
+                temperature=0,
+                max_tokens=200,
+            )
+        return completion.choices[0].message.content.strip()
 
     # Keep non-streaming version just in case
     async def get_response(self, text: str, system_message: str, history: list = None) -> str:
@@ -52,3 +283,6 @@ class SmartLLMService:
         async for chunk in self.get_response_stream(text, system_message, history):
             full_response += chunk
         return full_response
+
+    async def close(self):
+        await self.async_client.close()
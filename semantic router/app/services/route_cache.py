@@ -0,0 +1,98 @@
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, List, Tuple
+from app.core.metrics import Counter
+
+ROUTE_CACHE_LOOKUPS = Counter("router_cache_lookups_total", "Route cache lookups", ("tier", "result"))
+
+_NON_WORD = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+def normalize_text(text: str) -> str:
+    """
+    Lowercased, accent-folded, punctuation-stripped form used as cache key:
+    "¿Cuánto cuesta?" -> "cuanto cuesta".
+    """
+    folded = unicodedata.normalize("NFKD", text.lower())
+    folded = "".join(c for c in folded if not unicodedata.combining(c))
+    folded = _NON_WORD.sub(" ", folded)
+    return _SPACES.sub(" ", folded).strip()
+
+MISSING = object()
+
+class LRUCache:
+    """
+    Small LRU cache with a per-entry TTL.
+    """
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Any, Tuple[Any, float]]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        value, expires_at = entry
+        if time.monotonic() > expires_at:
+            del self._entries[key]
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Any, value: Any):
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+class RouteCache:
+    """
+    Two-tier cache in front of the router, keyed on normalized text:
+    route decisions (dropped whenever the index changes) and, optionally, embeddings
+    (still valid after a reseed, so only the index lookup is paid again).
+    """
+    def __init__(self, max_size: int, ttl: float, embedding_max_size: int = 0):
+        self.decisions = LRUCache(max_size, ttl)
+        self.embeddings = LRUCache(embedding_max_size, ttl) if embedding_max_size else None
+
+    def get_decision(self, key: Any) -> Any:
+        """
+        Returns the cached route name (None is a valid cached decision) or MISSING.
+        """
+        decision = self.decisions.get(key, MISSING)
+        ROUTE_CACHE_LOOKUPS.inc(tier="decision", result="miss" if decision is MISSING else "hit")
+        return decision
+
+    def put_decision(self, key: Any, route_name: str | None):
+        self.decisions.put(key, route_name)
+
+    def get_embedding(self, key: str) -> List[float] | None:
+        if self.embeddings is None:
+            return None
+        vector = self.embeddings.get(key)
+        ROUTE_CACHE_LOOKUPS.inc(tier="embedding", result="miss" if vector is None else "hit")
+        return vector
+
+    def put_embedding(self, key: str, vector: List[float]):
+        if self.embeddings is not None:
+            self.embeddings.put(key, vector)
+
+    def invalidate(self):
+        """
+        Drops the route decisions; called when the index is reseeded.
+        """
+        self.decisions.clear()
+
+    def hit_rate(self, tier: str = "decision") -> float:
+        hits = ROUTE_CACHE_LOOKUPS.value(tier=tier, result="hit")
+        total = hits + ROUTE_CACHE_LOOKUPS.value(tier=tier, result="miss")
+        return hits / total if total else 0.0
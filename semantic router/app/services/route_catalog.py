@@ -0,0 +1,175 @@
+import hashlib
+import json
+import time
+import uuid
+from typing import Dict, List, Tuple
+from qdrant_client import models
+from semantic_router.index.qdrant import SR_ROUTE_PAYLOAD_KEY, SR_UTTERANCE_PAYLOAD_KEY
+
+CONTENT_HASH_PAYLOAD_KEY = "sr_content_hash"
+# The version marker lives in a one-point side collection, so it never shows up in route searches.
+VERSION_MARKER_ID = 1
+
+def load_routes(path: str) -> Dict[str, List[str]]:
+    """
+    Reads the route catalogue: {"routes": [{"name": ..., "utterances": [...]}, ...]}.
+    """
+    with open(path, encoding="utf-8") as f:
+        catalogue = json.load(f)
+    routes: Dict[str, List[str]] = {}
+    for route in catalogue["routes"]:
+        routes.setdefault(route["name"], []).extend(route["utterances"])
+    return routes
+
+def version_collection(collection_name: str) -> str:
+    return f"{collection_name}-version"
+
+def content_hash(route_name: str, utterance: str, encoder_name: str) -> str:
+    # The encoder is part of the content: switching models re-embeds everything.
+    return hashlib.sha256(f"{encoder_name}\x00{route_name}\x00{utterance}".encode("utf-8")).hexdigest()
+
+def point_id(digest: str) -> str:
+    # Qdrant ids are UUIDs or integers; the hash makes upserts idempotent.
+    return str(uuid.UUID(digest[:32]))
+
+class IndexSync:
+    """
+    Brings the Qdrant route collection in line with the catalogue without rebuilding it:
+    only utterances whose content hash is new are embedded (in batches) and upserted,
+    points whose hash is no longer in the catalogue are deleted, and the version marker
+    is bumped whenever anything changed.
+    """
+    def __init__(self, client, encoder, collection_name: str, batch_size: int = 64):
+        self.client = client
+        self.encoder = encoder
+        self.collection_name = collection_name
+        self.batch_size = batch_size
+        self.encoder_name = getattr(encoder, "name", type(encoder).__name__)
+
+    def plan(self, routes: Dict[str, List[str]]) -> Tuple[Dict[str, Tuple[str, str, str]], List[str]]:
+        """
+        Returns (points to add: id -> (route, utterance, hash), ids to delete).
+        """
+        wanted = {}
+        for route_name, utterances in routes.items():
+            for utterance in utterances:
+                digest = content_hash(route_name, utterance, self.encoder_name)
+                wanted[point_id(digest)] = (route_name, utterance, digest)
+
+        existing = set(self._existing_ids())
+        to_add = {pid: entry for pid, entry in wanted.items() if pid not in existing}
+        to_delete = [pid for pid in existing if pid not in wanted]
+        return to_add, to_delete
+
+    def _existing_ids(self) -> List[str]:
+        if not self.client.collection_exists(self.collection_name):
+            return []
+        ids, offset = [], None
+        while True:
+            page, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                limit=256,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False,
+            )
+            ids.extend(str(point.id) for point in page)
+            if offset is None:
+                return ids
+
+    def _ensure_collection(self, collection_name: str, dimensions: int, distance: models.Distance):
+        if not self.client.collection_exists(collection_name):
+            self.client.create_collection(
+                collection_name=collection_name,
+                vectors_config=models.VectorParams(size=dimensions, distance=distance),
+            )
+
+    def apply(self, to_add: Dict[str, Tuple[str, str, str]], to_delete: List[str]) -> str | None:
+        """
+        Embeds and upserts `to_add`, deletes `to_delete` and writes the version marker.
+        Returns the new version, or None if there was nothing to do.
+        """
+        if not to_add and not to_delete:
+            return None
+
+        entries = list(to_add.items())
+        for start in range(0, len(entries), self.batch_size):
+            batch = entries[start:start + self.batch_size]
+            vectors = self.encoder([utterance for _, (_, utterance, _) in batch])
+            if start == 0:
+                self._ensure_collection(self.collection_name, len(vectors[0]), models.Distance.COSINE)
+            self.client.upsert(
+                collection_name=self.collection_name,
+                points=[
+                    models.PointStruct(
+                        id=pid,
+                        vector=list(vector),
+                        payload={
+                            SR_ROUTE_PAYLOAD_KEY: route_name,
+                            SR_UTTERANCE_PAYLOAD_KEY: utterance,
+                            CONTENT_HASH_PAYLOAD_KEY: digest,
+                        },
+                    )
+                    for (pid, (route_name, utterance, digest)), vector in zip(batch, vectors)
+                ],
+                wait=True,
+            )
+
+        for start in range(0, len(to_delete), self.batch_size):
+            self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=models.PointIdsList(points=to_delete[start:start + self.batch_size]),
+                wait=True,
+            )
+
+        version = self._catalogue_version()
+        self._ensure_collection(version_collection(self.collection_name), 1, models.Distance.DOT)
+        self.client.upsert(
+            collection_name=version_collection(self.collection_name),
+            points=[models.PointStruct(
+                id=VERSION_MARKER_ID,
+                vector=[1.0],
+                payload={"version": version, "updated_at": time.time()},
+            )],
+            wait=True,
+        )
+        return version
+
+    def _catalogue_version(self) -> str:
+        # Derived from the ids actually stored, so it changes exactly when the index does.
+        ids = sorted(self._existing_ids())
+        return hashlib.sha256("\n".join(ids).encode()).hexdigest()[:16]
+
+def _marker_version(points) -> str | None:
+    if not points:
+        return None
+    return (points[0].payload or {}).get("version")
+
+async def read_index_version(client, collection_name: str) -> str | None:
+    """
+    The version written by the last incremental seed, or None if the collection was
+    never seeded with a marker (or the marker collection is unreachable).
+    """
+    try:
+        points = await client.retrieve(
+            collection_name=version_collection(collection_name),
+            ids=[VERSION_MARKER_ID],
+            with_payload=True,
+        )
+    except Exception:
+        return None
+    return _marker_version(points)
+
+def read_index_version_sync(client, collection_name: str) -> str | None:
+    """
+    Same as read_index_version, with the sync client (startup only).
+    """
+    try:
+        points = client.retrieve(
+            collection_name=version_collection(collection_name),
+            ids=[VERSION_MARKER_ID],
+            with_payload=True,
+        )
+    except Exception:
+        return None
+    return _marker_version(points)
@@ -0,0 +1,126 @@
+from typing import Dict, List, Mapping, Sequence
+import numpy as np
+from semantic_router.index.qdrant import SR_ROUTE_PAYLOAD_KEY
+
+def classify(scores_by_route: Dict[str, List[float]], score_threshold: float, route_thresholds: Mapping[str, float] | None = None) -> str | None:
+    # Same rule as RouteLayer: the route with the highest summed score wins,
+    # as long as its best single hit clears the route's threshold.
+    if not scores_by_route:
+        return None
+    top_route = max(scores_by_route, key=lambda name: sum(scores_by_route[name]))
+    threshold = (route_thresholds or {}).get(top_route, score_threshold)
+    if max(scores_by_route[top_route]) > threshold:
+        return top_route
+    return None
+
+class LocalRouteIndex:
+    """
+    In-process copy of the route vectors: one contiguous, L2-normalized float32 matrix
+    plus the route name of every row. Qdrant stays the source of truth; this is only a
+    read replica refreshed from it (or from a snapshot file). `version` is the index
+    version (RouterService fingerprint) the vectors were pulled at, saved with the
+    snapshot so a stale file can be told apart from a current one.
+    """
+    def __init__(self, vectors: Sequence[Sequence[float]], routes: Sequence[str], version: str | None = None):
+        matrix = np.ascontiguousarray(np.asarray(vectors, dtype=np.float32))
+        if matrix.ndim != 2 or len(matrix) != len(routes):
+            raise ValueError("vectors must be a 2D array with one row per route entry")
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.matrix = matrix / norms
+        self.routes = np.asarray(routes)
+        self.version = version
+
+    def __len__(self):
+        return len(self.routes)
+
+    @classmethod
+    def from_points(cls, points) -> "LocalRouteIndex":
+        vectors, routes = [], []
+        for point in points:
+            route_name = (point.payload or {}).get(SR_ROUTE_PAYLOAD_KEY)
+            if route_name and point.vector is not None:
+                vectors.append(point.vector)
+                routes.append(route_name)
+        return cls(vectors, routes)
+
+    @classmethod
+    def from_qdrant(cls, client, collection_name: str, page_size: int = 256) -> "LocalRouteIndex":
+        """
+        Pulls every route vector from Qdrant with the sync client (startup only).
+        """
+        points, offset = [], None
+        while True:
+            page, offset = client.scroll(
+                collection_name=collection_name,
+                limit=page_size,
+                offset=offset,
+                with_payload=[SR_ROUTE_PAYLOAD_KEY],
+                with_vectors=True,
+            )
+            points.extend(page)
+            if offset is None:
+                return cls.from_points(points)
+
+    @classmethod
+    async def afrom_qdrant(cls, client, collection_name: str, page_size: int = 256) -> "LocalRouteIndex":
+        """
+        Same as from_qdrant, using the async client so a running server can reload.
+        """
+        points, offset = [], None
+        while True:
+            page, offset = await client.scroll(
+                collection_name=collection_name,
+                limit=page_size,
+                offset=offset,
+                with_payload=[SR_ROUTE_PAYLOAD_KEY],
+                with_vectors=True,
+            )
+            points.extend(page)
+            if offset is None:
+                return cls.from_points(points)
+
+    @classmethod
+    def load(cls, path: str) -> "LocalRouteIndex":
+        with np.load(path) as snapshot:
+            # Snapshots written before versions were stored load as version None (stale).
+            version = str(snapshot["version"]) if "version" in snapshot.files else None
+            return cls(snapshot["vectors"], snapshot["routes"].tolist(), version)
+
+    def save(self, path: str):
+        # Write through a file object so numpy doesn't append ".npz" to the configured path.
+        arrays = {"vectors": self.matrix, "routes": self.routes}
+        if self.version is not None:
+            arrays["version"] = np.asarray(self.version)
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    def query(self, vector: Sequence[float], top_k: int = 5, routes: Sequence[str] | None = None) -> Dict[str, List[float]]:
+        """
+        Scores every entry with a single matrix-vector product and groups the top_k hits by route.
+        If `routes` is given, only entries of those routes are considered.
+        """
+        if not len(self.routes):
+            return {}
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        scores = self.matrix @ query
+
+        candidates = len(scores)
+        if routes is not None:
+            mask = np.isin(self.routes, routes)
+            candidates = int(mask.sum())
+            if not candidates:
+                return {}
+            scores = np.where(mask, scores, -np.inf)
+
+        k = min(top_k, candidates)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        scores_by_route: Dict[str, List[float]] = {}
+        for i in top:
+            scores_by_route.setdefault(str(self.routes[i]), []).append(float(scores[i]))
+        return scores_by_route
@@ -1,52 +1,316 @@
+import asyncio
+import math
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Sequence
+import httpx
 from semantic_router import Route
-from semantic_router.encoders import HuggingFaceEncoder
 from semantic_router.layer import RouteLayer
-from semantic_router.index.qdrant import QdrantIndex
-from qdrant_client import QdrantClient
+from semantic_router.index.qdrant import QdrantIndex, SR_ROUTE_PAYLOAD_KEY
+from qdrant_client import QdrantClient, AsyncQdrantClient, models
+from app.core.admission import Overloaded, encoder_limit, qdrant_limit
 from app.core.config import settings
+from app.core.metrics import Counter, Histogram
+from app.core.tracing import timed
+from app.services.encoder_batcher import EncoderBatcher
+from app.services.encoders import create_encoder
+from app.services.route_cache import MISSING, RouteCache, normalize_text
+from app.services.route_catalog import read_index_version, read_index_version_sync
+from app.services.route_index import LocalRouteIndex, classify
+
+ROUTER_CHECKS = Counter(
+    "router_checks_total", "Route checks by how they were resolved (skipped, lexical, cache, semantic)", ("outcome",)
+)
+ROUTER_CHECK_LATENCY = Histogram(
+    "router_check_seconds", "check_route latency by how it was resolved", ("outcome",),
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+
+# Unambiguous phrases matched on normalized text before any embedding is computed.
+# They override the semantic routes (also at root_greeting), so each one has to be a
+# full request for a person: accident reports mention "agente de tránsito", "error
+# humano" or "el operador de la grúa" all the time.
+LEXICAL_ROUTES = {
+    "human_handoff": [
+        r"\bhablar con (un|una) (humano|humana|agente|operador|operadora)\b(?! de\b)",
+        r"\bhablar con (una persona|alguien)$",
+        r"\bpersona (real|de verdad)\b",
+        r"\b(pasame|paseme|comunicame|comuniqueme|transferime|transfierame) con "
+        r"(una persona|alguien|un humano|un agente|un operador|una operadora)\b(?! de\b)",
+        r"\bno (eres|sos) (real|humana|una persona)\b",
+    ],
+}
+
+def compile_lexical_routes() -> Dict[str, re.Pattern]:
+    return {route_name: re.compile("|".join(patterns)) for route_name, patterns in LEXICAL_ROUTES.items()}
 
 class RouterService:
-    def __init__(self):
-        # Initialize Encoder (using a standard one for now, or could be OpenAI/Cohere)
-        # Using HuggingFace for cost efficiency in this example, but can be swapped.
-        self.encoder = HuggingFaceEncoder()
-        
+    def __init__(self, index_mode: str | None = None):
+        # Initialize Encoder: HuggingFace (PyTorch) or the same model on onnxruntime,
+        # selected by ROUTER_ENCODER_BACKEND.
+        self.encoder = create_encoder()
+
         # Connect to Qdrant
         self.qdrant_client = QdrantClient(
             url=settings.QDRANT_URL,
             api_key=settings.QDRANT_API_KEY,
         )
-        
+
+        # Async client used on the request path, so the vector search never blocks the event loop.
+        # The connection pool is shared by all concurrent calls.
+        self.async_qdrant_client = AsyncQdrantClient(
+            url=settings.QDRANT_URL,
+            api_key=settings.QDRANT_API_KEY,
+            # The client takes whole seconds; round up so a sub-second setting never becomes 0.
+            timeout=math.ceil(settings.QDRANT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=settings.QDRANT_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.QDRANT_MAX_CONNECTIONS,
+            ),
+        )
+
         # Initialize Index
         self.index = QdrantIndex(
             client=self.qdrant_client,
             collection_name=settings.QDRANT_COLLECTION,
         )
-        
-        # Initialize basic routes just to have structure, 
+
+        # Initialize basic routes just to have structure,
         # but the real power comes from the seeded index.
-        # If the index is already populated, we might not need to pass routes list here 
+        # If the index is already populated, we might not need to pass routes list here
         # depending on semantic-router version, but usually we define the Route objects.
         # For dynamic checking against what's in Qdrant:
-        self.routes = [] 
-        
+        self.routes = []
+
         # We assume the index is already populated via seed_router.py
-        # The RouteLayer needs at least definitions of the routes if we want to use them locally 
+        # The RouteLayer needs at least definitions of the routes if we want to use them locally
         # or we trust the Index to return the route name.
-        
+
         self.layer = RouteLayer(encoder=self.encoder, index=self.index, routes=self.routes)
 
-    async def check_route(self, text: str) -> str | None:
+        # The encoder forward pass is CPU-bound: run it on a bounded pool instead of the event loop.
+        self.encoder_pool = ThreadPoolExecutor(
+            max_workers=settings.ROUTER_ENCODER_WORKERS,
+            thread_name_prefix="router-encoder",
+        )
+        # Concurrent turns share encoder forward passes instead of encoding one sentence each.
+        self.batcher = None
+        if settings.ROUTER_BATCH_ENABLED:
+            self.batcher = EncoderBatcher(
+                encode_batch=self.encoder,
+                executor=self.encoder_pool,
+                max_batch_size=settings.ROUTER_BATCH_MAX_SIZE,
+                max_wait_ms=settings.ROUTER_BATCH_MAX_WAIT_MS,
+            )
+        self.top_k = settings.ROUTER_TOP_K
+        self.score_threshold = self.layer.score_threshold
+        self.route_thresholds = settings.ROUTER_ROUTE_THRESHOLDS
+
+        # "local" keeps an in-process copy of the route vectors so a turn never
+        # leaves the process; "qdrant" queries the collection on every turn.
+        self.index_mode = index_mode or settings.ROUTER_INDEX_MODE
+        self.local_index: LocalRouteIndex | None = None
+        if self.index_mode == "local":
+            self.local_index = self._load_local_index()
+
+        # Callers repeat the same short phrases; skip the encoder and index for those.
+        self.cache: RouteCache | None = None
+        if settings.ROUTE_CACHE_ENABLED:
+            self.cache = RouteCache(
+                max_size=settings.ROUTE_CACHE_MAX_SIZE,
+                ttl=settings.ROUTE_CACHE_TTL,
+                embedding_max_size=settings.ROUTE_CACHE_EMBEDDING_MAX_SIZE,
+            )
+        self.lexical_routes = compile_lexical_routes()
+        self._index_fingerprint = None
+        self._watcher: asyncio.Task | None = None
+
+    def _load_local_index(self) -> LocalRouteIndex:
+        path = settings.ROUTER_LOCAL_INDEX_PATH
+        if path and os.path.exists(path):
+            # Possibly stale: start() compares its version with Qdrant's before serving.
+            index = LocalRouteIndex.load(path)
+        else:
+            # Read before pulling: a reseed in between shows up as a change on the next check.
+            version = self._fingerprint_sync()
+            index = LocalRouteIndex.from_qdrant(self.qdrant_client, settings.QDRANT_COLLECTION)
+            index.version = version
+            if path:
+                index.save(path)
+        print(f"Router: loaded {len(index)} route vectors into the local index")
+        return index
+
+    async def refresh(self):
+        """
+        Picks up a reseeded index: drops cached route decisions and reloads
+        the local index from Qdrant (the source of truth).
+        """
+        if self.cache is not None:
+            self.cache.invalidate()
+        if self.index_mode != "local":
+            return
+        version = await self._fingerprint()
+        index = await LocalRouteIndex.afrom_qdrant(self.async_qdrant_client, settings.QDRANT_COLLECTION)
+        index.version = version
+        if settings.ROUTER_LOCAL_INDEX_PATH:
+            index.save(settings.ROUTER_LOCAL_INDEX_PATH)
+        # Swap in one assignment so in-flight queries keep using the old matrix.
+        self.local_index = index
+        print(f"Router: reloaded {len(index)} route vectors into the local index")
+
+    async def _fingerprint(self) -> str:
+        # seed_router.py bumps the version marker on every change; collections seeded
+        # before the marker existed fall back to the point count.
+        fingerprint = await read_index_version(self.async_qdrant_client, settings.QDRANT_COLLECTION)
+        if fingerprint is None:
+            result = await self.async_qdrant_client.count(collection_name=settings.QDRANT_COLLECTION, exact=True)
+            fingerprint = result.count
+        return str(fingerprint)
+
+    def _fingerprint_sync(self) -> str:
+        fingerprint = read_index_version_sync(self.qdrant_client, settings.QDRANT_COLLECTION)
+        if fingerprint is None:
+            fingerprint = self.qdrant_client.count(collection_name=settings.QDRANT_COLLECTION, exact=True).count
+        return str(fingerprint)
+
+    async def _index_changed(self) -> bool:
+        fingerprint = await self._fingerprint()
+        if self._index_fingerprint is None:
+            # First check: the local copy is stale unless it was pulled at this very version.
+            changed = self.local_index is not None and self.local_index.version != fingerprint
+        else:
+            changed = fingerprint != self._index_fingerprint
+        self._index_fingerprint = fingerprint
+        return changed
+
+    async def _check_index(self):
+        try:
+            if await self._index_changed():
+                print("Router: index change detected, refreshing")
+                await self.refresh()
+        except Exception as e:
+            print(f"Router index watch error: {e}")
+
+    async def _watch_index(self):
+        while True:
+            await asyncio.sleep(settings.ROUTER_INDEX_POLL_INTERVAL)
+            await self._check_index()
+
+    async def ping(self):
+        """
+        Opens the Qdrant connection and checks the route collection exists.
+        """
+        await self.async_qdrant_client.get_collection(settings.QDRANT_COLLECTION)
+
+    async def start(self):
+        # Qdrant is the source of truth: a snapshot file older than the last reseed is
+        # replaced before the first turn, even with polling disabled.
+        await self._check_index()
+        if settings.ROUTER_INDEX_POLL_INTERVAL > 0 and (self._watcher is None or self._watcher.done()):
+            self._watcher = asyncio.get_running_loop().create_task(self._watch_index())
+
+    async def encode(self, text: str) -> List[float]:
+        """
+        Embeds a single text on the encoder pool, micro-batched with concurrent callers if enabled.
+        """
+        async with encoder_limit.slot():
+            if self.batcher is not None:
+                return await self.batcher.encode(text)
+            loop = asyncio.get_running_loop()
+            embeddings = await loop.run_in_executor(self.encoder_pool, self.encoder, [text])
+            return embeddings[0]
+
+    async def search(self, vector: List[float], routes: Sequence[str] | None = None) -> str | None:
+        """
+        Finds the nearest utterances (local matrix or Qdrant) and classifies the hits by route.
+        If `routes` is given, only utterances of those routes are scored.
+        """
+        if self.local_index is not None:
+            return self._classify(self.local_index.query(vector, self.top_k, routes))
+
+        query_filter = None
+        if routes is not None:
+            query_filter = models.Filter(must=[
+                models.FieldCondition(key=SR_ROUTE_PAYLOAD_KEY, match=models.MatchAny(any=list(routes)))
+            ])
+        async with qdrant_limit.slot():
+            response = await self.async_qdrant_client.query_points(
+                collection_name=settings.QDRANT_COLLECTION,
+                query=vector,
+                query_filter=query_filter,
+                limit=self.top_k,
+                with_payload=[SR_ROUTE_PAYLOAD_KEY],
+            )
+        scores_by_route: Dict[str, List[float]] = {}
+        for point in response.points:
+            route_name = point.payload.get(SR_ROUTE_PAYLOAD_KEY)
+            if route_name:
+                scores_by_route.setdefault(route_name, []).append(point.score)
+        return self._classify(scores_by_route)
+
+    def _classify(self, scores_by_route: Dict[str, List[float]]) -> str | None:
+        return classify(scores_by_route, self.score_threshold, self.route_thresholds)
+
+    def match_lexical(self, normalized_text: str, routes: Sequence[str] | None = None) -> str | None:
+        for route_name, pattern in self.lexical_routes.items():
+            if (routes is None or route_name in routes) and pattern.search(normalized_text):
+                return route_name
+        return None
+
+    async def check_route(self, text: str, routes: Sequence[str] | None = None) -> str | None:
         """
         Checks the semantic route for the given text.
+        `routes` restricts the check to the routes the caller can act on (None = all).
         Returns the route name if found, else None.
         """
+        if routes is not None and not routes:
+            ROUTER_CHECKS.inc(outcome="skipped")
+            return None
+
+        start = time.perf_counter()
+        outcome = "semantic"
         try:
-            # semantic-router call
-            route = self.layer(text)
-            if route.name:
-                return route.name
+            key = normalize_text(text)
+            route_name = self.match_lexical(key, routes)
+            if route_name is not None:
+                outcome = "lexical"
+                return route_name
+
+            if self.cache is None:
+                return await timed("index", self.search(await timed("encode", self.encode(text)), routes))
+
+            # Decisions depend on which routes were eligible, so the scope is part of the key.
+            decision_key = (key, tuple(routes) if routes is not None else None)
+            route_name = self.cache.get_decision(decision_key)
+            if route_name is not MISSING:
+                outcome = "cache"
+                return route_name
+
+            vector = self.cache.get_embedding(key)
+            if vector is None:
+                vector = await timed("encode", self.encode(text))
+                self.cache.put_embedding(key, vector)
+            route_name = await timed("index", self.search(vector, routes))
+            self.cache.put_decision(decision_key, route_name)
+            return route_name
+        except Overloaded:
+            # Shed: the turn goes on in the current node rather than waiting for the router.
+            outcome = "shed"
             return None
         except Exception as e:
             print(f"Router Error: {e}")
+            outcome = "error"
             return None
+        finally:
+            ROUTER_CHECKS.inc(outcome=outcome)
+            ROUTER_CHECK_LATENCY.observe(time.perf_counter() - start, outcome=outcome)
+
+    async def close(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+        if self.batcher is not None:
+            await self.batcher.close()
+        await self.async_qdrant_client.close()
+        self.encoder_pool.shutdown(wait=False)
@@ -0,0 +1,63 @@
+import asyncio
+import datetime
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict
+from app.core.config import settings
+from app.core.metrics import Counter, Histogram
+
+TOOL_CALLS = Counter("tool_calls_total", "Tool executions", ("tool", "outcome"))
+TOOL_SECONDS = Histogram("tool_call_seconds", "Tool execution latency", ("tool",))
+
+ToolHandler = Callable[[Dict[str, Any], Any], Awaitable[Any]]
+
+class ToolRegistry:
+    """
+    Maps the function names declared by nodes to async handlers.
+    A handler receives the parsed arguments and the FlowInstance, and returns any
+    JSON-serializable result, which is fed back to the LLM as the tool message.
+    """
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self._handlers: Dict[str, ToolHandler] = {}
+
+    def register(self, name: str, handler: ToolHandler):
+        self._handlers[name] = handler
+
+    async def run(self, name: str, arguments: Dict[str, Any], flow: Any = None) -> str:
+        handler = self._handlers.get(name)
+        if handler is None:
+            TOOL_CALLS.inc(tool=name, outcome="unknown")
+            return json.dumps({"error": f"Unknown tool '{name}'"})
+
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(handler(arguments, flow), self.timeout)
+            outcome = "ok"
+        except asyncio.TimeoutError:
+            result, outcome = {"error": "timeout"}, "timeout"
+        except Exception as e:
+            print(f"Tool Error ({name}): {e}")
+            result, outcome = {"error": str(e)}, "error"
+        TOOL_CALLS.inc(tool=name, outcome=outcome)
+        TOOL_SECONDS.observe(time.perf_counter() - start, tool=name)
+        return json.dumps(result, ensure_ascii=False)
+
+# Placeholder handlers until the studio's calendar is integrated.
+
+async def check_availability(arguments: Dict[str, Any], flow: Any) -> Dict[str, Any]:
+    today = datetime.date.today()
+    slots = []
+    day = today
+    while len(slots) < 4:
+        day += datetime.timedelta(days=1)
+        if day.weekday() < 5:
+            slots.extend([f"{day.isoformat()} 10:00", f"{day.isoformat()} 16:00"])
+    return {"available": True, "slots": slots}
+
+async def book_appointment(arguments: Dict[str, Any], flow: Any) -> Dict[str, Any]:
+    return {"status": "confirmed", "date": arguments.get("date"), "email": arguments.get("email")}
+
+tool_registry = ToolRegistry(timeout=settings.TOOL_TIMEOUT)
+tool_registry.register("check_availability", check_availability)
+tool_registry.register("book_appointment", book_appointment)
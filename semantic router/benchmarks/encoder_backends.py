@@ -0,0 +1,168 @@
+"""
+Compares the routing encoder backends (PyTorch HuggingFaceEncoder, ONNX fp32, ONNX int8)
+on load time, RSS, single-sentence latency and batch throughput, and checks accuracy
+against PyTorch: each backend seeds its own index from routes.json (as seed_router.py
+would) and must pick the same route as PyTorch for the seeded utterances and probes.
+Exits non-zero if a backend falls outside the tolerances.
+
+Each backend runs in its own process so its memory is measured in isolation.
+
+The ONNX models are exported up front (torch/transformers, requirements-onnx-export.txt),
+outside the timed child processes. Run from the project root:
+    python -m benchmarks.encoder_backends --min-agreement 1.0 --min-cosine 0.98
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List
+import numpy as np
+
+BACKENDS = {
+    "torch": {"ROUTER_ENCODER_BACKEND": "torch"},
+    "onnx": {"ROUTER_ENCODER_BACKEND": "onnx", "ROUTER_ONNX_QUANTIZE": "false"},
+    "onnx-int8": {"ROUTER_ENCODER_BACKEND": "onnx", "ROUTER_ONNX_QUANTIZE": "true"},
+}
+
+# Phrases callers actually say, beyond the seeded utterances (some match no route)
+PROBES = [
+    "hola, buenos días",
+    "quiero saber los precios",
+    "me chocó un colectivo ayer",
+    "tuve un choque con la moto",
+    "cuánto me va a salir la consulta",
+    "prefiero hablar con alguien de carne y hueso",
+    "fue en Córdoba capital",
+    "el martes a las 10",
+]
+
+def rss_mb() -> float | None:
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+def measure(routes_path: str, repeats: int) -> Dict:
+    """
+    Child process: load the backend from the environment and time it.
+    """
+    from app.services.encoders import create_encoder
+    from app.services.route_catalog import load_routes
+
+    routes = load_routes(routes_path)
+    utterances = [(route, text) for route, texts in routes.items() for text in texts]
+
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    encoder = create_encoder()
+    encoder(["hola"])  # first call allocates the session / kernels
+    load_seconds = time.perf_counter() - start
+    rss_after = rss_mb()
+
+    latencies = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        encoder([PROBES[i % len(PROBES)]])
+        latencies.append(time.perf_counter() - start)
+    batch = [text for _, text in utterances][:32]
+    start = time.perf_counter()
+    for _ in range(max(1, repeats // 10)):
+        encoder(batch)
+    batch_seconds = (time.perf_counter() - start) / max(1, repeats // 10)
+
+    latencies.sort()
+    utterance_vectors = encoder([text for _, text in utterances])
+    return {
+        "name": getattr(encoder, "name", type(encoder).__name__),
+        "load_s": round(load_seconds, 3),
+        "rss_mb": round(rss_after - rss_before, 1) if rss_before is not None else None,
+        "single_ms": {
+            "p50": round(latencies[len(latencies) // 2] * 1000, 2),
+            "p95": round(latencies[int(len(latencies) * 0.95)] * 1000, 2),
+        },
+        "batch_sentences_per_s": round(len(batch) / batch_seconds, 1),
+        "routes": [route for route, _ in utterances],
+        "utterance_vectors": utterance_vectors,
+        # Seeded utterances first, then the extra probes
+        "probe_vectors": utterance_vectors + encoder(PROBES),
+    }
+
+def decisions(result: Dict, top_k: int, threshold: float) -> List[str | None]:
+    from app.services.route_index import LocalRouteIndex, classify
+    index = LocalRouteIndex(result["utterance_vectors"], result["routes"])
+    return [classify(index.query(vector, top_k), threshold) for vector in result["probe_vectors"]]
+
+def run_backend(name: str, args) -> Dict:
+    env = {**os.environ, **BACKENDS[name]}
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.encoder_backends", "--child", "--routes", args.routes, "--repeats", str(args.repeats)],
+        env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def export_backends(names: List[str]):
+    from app.services.encoders import ensure_onnx_export
+    from app.core.config import settings
+    for name in names:
+        if BACKENDS[name]["ROUTER_ENCODER_BACKEND"] == "onnx":
+            ensure_onnx_export(settings.ROUTER_ENCODER_MODEL, quantize=BACKENDS[name]["ROUTER_ONNX_QUANTIZE"] == "true")
+
+def main(args) -> int:
+    export_backends(args.backends)
+    results = {name: run_backend(name, args) for name in args.backends}
+    reference = results["torch"]
+    reference_decisions = decisions(reference, args.top_k, args.threshold)
+    reference_vectors = np.asarray(reference["probe_vectors"])
+
+    failed = False
+    report = {}
+    for name, result in results.items():
+        vectors = np.asarray(result["probe_vectors"])
+        cosines = (vectors * reference_vectors).sum(axis=1)
+        agree = np.mean([a == b for a, b in zip(decisions(result, args.top_k, args.threshold), reference_decisions)])
+        ok = agree >= args.min_agreement and cosines.min() >= args.min_cosine
+        failed |= not ok
+        report[name] = {
+            key: result[key] for key in ("name", "load_s", "rss_mb", "single_ms", "batch_sentences_per_s")
+        }
+        report[name].update({
+            "route_agreement": round(float(agree), 4),
+            "cosine_vs_torch": {"min": round(float(cosines.min()), 4), "mean": round(float(cosines.mean()), 4)},
+            "ok": bool(ok),
+        })
+        print(
+            f"{name:<10} load {result['load_s']:>6.2f}s | RSS +{result['rss_mb']} MB | "
+            f"1 sentence p50 {result['single_ms']['p50']} ms | {result['batch_sentences_per_s']} sent/s (batch) | "
+            f"agreement {agree:.1%} | min cos {cosines.min():.4f} | {'OK' if ok else 'FAIL'}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--routes", default="routes.json")
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--min-agreement", type=float, default=1.0, help="share of route decisions that must match torch")
+    parser.add_argument("--min-cosine", type=float, default=0.98, help="lowest allowed cosine to the torch embedding")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.routes, args.repeats)))
+    else:
+        if "torch" not in args.backends:
+            parser.error("torch is the reference backend and must be included")
+        sys.exit(main(args))
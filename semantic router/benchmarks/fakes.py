@@ -0,0 +1,245 @@
+"""
+Local stand-ins for the services the app talks to, so the load test runs offline:
+
+- Groq: /openai/v1/chat/completions (streamed with a configurable TTFT and tokens/sec,
+  plain JSON for summaries) and /openai/v1/models for the startup warmup.
+- Qdrant: just enough of the REST API for the app (collection info, count, query,
+  scroll), doing exact cosine search over the seeded route utterances.
+- Langfuse: prompt fetches and an accept-everything ingestion endpoint.
+
+All three share one HTTP server. `app` runs main:app against them, with HashingEncoder
+in place of the HuggingFace model so no weights are downloaded.
+
+Run from the project root:
+    python -m benchmarks.fakes upstreams --port 8101 --ttft-ms 150 --tokens-per-sec 300 --slow-fraction 0.05
+    python -m benchmarks.fakes app --port 8100 --upstream http://127.0.0.1:8101
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from importlib.metadata import PackageNotFoundError, version
+from typing import Dict, List
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from semantic_router.index.qdrant import SR_ROUTE_PAYLOAD_KEY
+from app.services.route_catalog import load_routes
+
+REPLY = (
+    "Entiendo, lamento mucho lo que le pasó. Para poder ayudarle necesito algunos datos. "
+    "¿En qué ciudad ocurrió el accidente y hubo personas heridas?"
+)
+
+class HashingEncoder:
+    """
+    Deterministic stand-in for the HuggingFace encoder: hashed character trigrams,
+    L2-normalized. Identical texts score 1.0 and unrelated texts stay well below the
+    route threshold, which is all the load test needs from routing.
+    """
+    name = "hashing-trigrams"
+    score_threshold = 0.5
+
+    def __init__(self, dimensions: int = 256, **kwargs):
+        self.dimensions = dimensions
+
+    def __call__(self, docs: List[str]) -> List[List[float]]:
+        vectors = np.zeros((len(docs), self.dimensions), dtype=np.float32)
+        for row, doc in enumerate(docs):
+            text = f"  {doc.lower()} "
+            for i in range(len(text) - 2):
+                digest = hashlib.blake2b(text[i:i + 3].encode(), digest_size=4).digest()
+                vectors[row, int.from_bytes(digest, "little") % self.dimensions] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return (vectors / np.maximum(norms, 1e-12)).tolist()
+
+def create_upstreams(ttft: float, tokens_per_sec: float, routes_path: str = "routes.json",
+                     slow_fraction: float = 0.0, slow_ttft: float = 2.0) -> FastAPI:
+    app = FastAPI(title="Fake Groq / Qdrant / Langfuse")
+    encoder = HashingEncoder()
+    # Same catalogue seed_router.py writes to the real collection
+    routes = load_routes(routes_path)
+    utterances = [(route, text) for route, texts in routes.items() for text in texts]
+    matrix = np.array(encoder([text for _, text in utterances]), dtype=np.float32)
+    route_names = [route for route, _ in utterances]
+    token_delay = 1.0 / tokens_per_sec if tokens_per_sec > 0 else 0.0
+    tokens = [word + " " for word in REPLY.split(" ")]
+
+    # --- Groq (OpenAI-compatible) ---
+
+    @app.get("/openai/v1/models")
+    async def groq_models():
+        return {"object": "list", "data": [{"id": "llama-3.1-70b-versatile", "object": "model", "owned_by": "fake"}]}
+
+    @app.post("/openai/v1/chat/completions")
+    async def groq_chat(request: Request):
+        body = await request.json()
+        created = int(time.time())
+        if not body.get("stream"):
+            return {
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": created, "model": body["model"],
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "Resumen de la llamada."}}],
+            }
+
+        async def stream():
+            # A share of requests hit Groq's long TTFT tail
+            await asyncio.sleep(slow_ttft if random.random() < slow_fraction else ttft)
+            for i, token in enumerate(tokens):
+                if i and token_delay:
+                    await asyncio.sleep(token_delay)
+                chunk = {
+                    "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created, "model": body["model"],
+                    "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            end = {
+                "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created, "model": body["model"],
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+            yield f"data: {json.dumps(end)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    # --- Qdrant ---
+
+    def qdrant(result) -> dict:
+        return {"result": result, "status": "ok", "time": 0.0}
+
+    # Report the installed client's version so its compatibility check passes.
+    try:
+        qdrant_version = version("qdrant-client")
+    except PackageNotFoundError:
+        qdrant_version = "1.12.0"
+
+    @app.get("/")
+    async def qdrant_root():
+        return {"title": "qdrant - vector search engine", "version": qdrant_version}
+
+    @app.get("/collections/{name}")
+    async def qdrant_collection(name: str):
+        return qdrant({
+            "status": "green", "optimizer_status": "ok", "segments_count": 1,
+            "points_count": len(utterances), "indexed_vectors_count": len(utterances),
+            "payload_schema": {},
+            "config": {
+                "params": {"vectors": {"size": encoder.dimensions, "distance": "Cosine"},
+                           "shard_number": 1, "replication_factor": 1, "write_consistency_factor": 1,
+                           "on_disk_payload": True},
+                "hnsw_config": {"m": 16, "ef_construct": 100, "full_scan_threshold": 10000,
+                                "max_indexing_threads": 0, "on_disk": False},
+                "optimizer_config": {"deleted_threshold": 0.2, "vacuum_min_vector_number": 1000,
+                                     "default_segment_number": 0, "indexing_threshold": 20000,
+                                     "flush_interval_sec": 5},
+                "wal_config": {"wal_capacity_mb": 32, "wal_segments_ahead": 0},
+            },
+        })
+
+    @app.get("/collections/{name}/exists")
+    async def qdrant_exists(name: str):
+        return qdrant({"exists": True})
+
+    @app.post("/collections/{name}/points/count")
+    async def qdrant_count(name: str):
+        return qdrant({"count": len(utterances)})
+
+    @app.post("/collections/{name}/points/query")
+    async def qdrant_query(name: str, request: Request):
+        body = await request.json()
+        query = body["query"]
+        if isinstance(query, dict):
+            query = query["nearest"]
+        scores = matrix @ np.asarray(query, dtype=np.float32)
+        allowed = None
+        for condition in (body.get("filter") or {}).get("must") or []:
+            if condition.get("key") == SR_ROUTE_PAYLOAD_KEY:
+                allowed = set(condition["match"]["any"])
+        order = np.argsort(-scores)
+        points = [
+            {"id": int(i), "version": 0, "score": float(scores[i]), "payload": {SR_ROUTE_PAYLOAD_KEY: route_names[i]}}
+            for i in order if allowed is None or route_names[i] in allowed
+        ][:body.get("limit", 10)]
+        return qdrant({"points": points})
+
+    @app.post("/collections/{name}/points")
+    async def qdrant_retrieve(name: str):
+        # No index version marker: the app falls back to the point count.
+        return qdrant([])
+
+    @app.post("/collections/{name}/points/scroll")
+    async def qdrant_scroll(name: str):
+        points = [
+            {"id": i, "payload": {SR_ROUTE_PAYLOAD_KEY: route_names[i]}, "vector": matrix[i].tolist()}
+            for i in range(len(utterances))
+        ]
+        return qdrant({"points": points, "next_page_offset": None})
+
+    # --- Langfuse ---
+
+    # Tests publish prompt versions, slow Langfuse down or take it offline through these.
+    app.state.prompt_versions = {}
+    app.state.langfuse_delay = 0.0
+    app.state.langfuse_down = False
+
+    @app.get("/api/public/v2/prompts/{name}")
+    async def langfuse_prompt(name: str):
+        await asyncio.sleep(app.state.langfuse_delay)
+        if app.state.langfuse_down:
+            return JSONResponse({"message": "Internal Server Error"}, status_code=500)
+        prompt_version = app.state.prompt_versions.get(name, 1)
+        return {
+            "name": name, "version": prompt_version, "type": "text", "labels": ["production"], "tags": [], "config": {},
+            "prompt": f"Eres una recepcionista virtual de un estudio jurídico ({name}, v{prompt_version}). Responde breve.",
+        }
+
+    @app.api_route("/api/public/{path:path}", methods=["GET", "POST", "PUT"])
+    async def langfuse_ingestion(path: str):
+        # Traces, events, OTEL spans: accepted and dropped.
+        return JSONResponse({"successes": [], "errors": []}, status_code=207 if path == "ingestion" else 200)
+
+    return app
+
+def run_app(port: int, upstream: str, env: Dict[str, str]):
+    # Credentials are placeholders: every upstream is the fake server.
+    os.environ.update({
+        "GROQ_API_KEY": "fake", "GROQ_BASE_URL": upstream,
+        "QDRANT_URL": upstream, "QDRANT_API_KEY": "fake",
+        "LANGFUSE_SECRET_KEY": "fake", "LANGFUSE_PUBLIC_KEY": "fake", "LANGFUSE_HOST": upstream,
+        "ROUTER_ENCODER_BACKEND": "torch",
+    })
+    os.environ.update(env)
+    import semantic_router.encoders
+    semantic_router.encoders.HuggingFaceEncoder = HashingEncoder
+    import uvicorn
+    uvicorn.run("main:app", host="127.0.0.1", port=port, log_level="warning")
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="role", required=True)
+    upstreams = sub.add_parser("upstreams")
+    upstreams.add_argument("--port", type=int, default=8101)
+    upstreams.add_argument("--ttft-ms", type=float, default=150.0)
+    upstreams.add_argument("--tokens-per-sec", type=float, default=300.0)
+    upstreams.add_argument("--routes", default="routes.json")
+    upstreams.add_argument("--slow-fraction", type=float, default=0.0, help="share of Groq requests with --slow-ttft-ms")
+    upstreams.add_argument("--slow-ttft-ms", type=float, default=2000.0)
+    app = sub.add_parser("app")
+    app.add_argument("--port", type=int, default=8100)
+    app.add_argument("--upstream", default="http://127.0.0.1:8101")
+    app.add_argument("--env", action="append", default=[], help="extra app setting, e.g. --env SSE_COALESCE=true")
+    args = parser.parse_args()
+
+    if args.role == "upstreams":
+        import uvicorn
+        uvicorn.run(create_upstreams(args.ttft_ms / 1000, args.tokens_per_sec, args.routes,
+                                     args.slow_fraction, args.slow_ttft_ms / 1000),
+                    host="127.0.0.1", port=args.port, log_level="warning")
+    else:
+        run_app(args.port, args.upstream, dict(item.split("=", 1) for item in args.env))
+
+if __name__ == "__main__":
+    main()
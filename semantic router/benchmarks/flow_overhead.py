@@ -0,0 +1,67 @@
+"""
+Measures the per-turn overhead of the flow itself (node lookup, prompt, tools, history,
+transitions) for many concurrent sessions. The router and the LLM are replaced by
+in-process stubs that return immediately, so only FlowInstance work is timed.
+
+Run from the project root:
+    python -m benchmarks.flow_overhead --sessions 500 --turns 8
+"""
+import argparse
+import asyncio
+import time
+from app.flows.manager import FlowInstance
+
+# One scripted call walking root -> qualify -> details -> offer -> booking
+SCRIPT = [
+    ("tuve un accidente de tránsito", "legal_issue_traffic"),
+    ("fue en Córdoba capital, me llamo Ana", None),
+    ("hubo un herido leve, me chocaron de atrás", None),
+    ("sí, quiero agendar una cita", None),
+    ("el martes a las 10", None),
+    ("ana@example.com", None),
+    ("gracias", None),
+    ("nada más", None),
+]
+
+class StubRouter:
+    def __init__(self):
+        self.routes = {}
+
+    async def check_route(self, text, routes=None):
+        route = self.routes.get(text)
+        return route if routes is None or route in routes else None
+
+class StubLLMService:
+    def __init__(self):
+        self.router = StubRouter()
+        self.router.routes = {text: route for text, route in SCRIPT if route}
+
+    async def get_response_stream(self, text, system_message, history=None, tools=None, tool_executor=None):
+        for chunk in ("Perfecto, ", "entiendo. ", "¿Algo más?"):
+            yield chunk
+
+    async def summarize(self, messages, previous_summary=""):
+        return "Resumen de la llamada."
+
+async def run_session(llm_service: StubLLMService, call_id: str, turns: int):
+    flow = FlowInstance(call_id, llm_service)
+    for i in range(turns):
+        text, _ = SCRIPT[i % len(SCRIPT)]
+        async for _ in flow.process_input_stream(text):
+            pass
+
+async def main(sessions: int, turns: int):
+    llm_service = StubLLMService()
+    start = time.perf_counter()
+    await asyncio.gather(*(run_session(llm_service, f"call-{i}", turns) for i in range(sessions)))
+    elapsed = time.perf_counter() - start
+    total_turns = sessions * turns
+    print(f"{sessions} sessions x {turns} turns = {total_turns} turns in {elapsed:.3f}s")
+    print(f"per-turn flow overhead: {elapsed / total_turns * 1e6:.1f} us | {total_turns / elapsed:.0f} turns/s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--turns", type=int, default=len(SCRIPT))
+    args = parser.parse_args()
+    asyncio.run(main(args.sessions, args.turns))
@@ -0,0 +1,216 @@
+"""
+Offline load test: starts the fake upstreams and main:app (see benchmarks/fakes.py),
+then drives the app with many concurrent simulated Vapi calls. Each call walks the
+flow root_greeting -> qualify_start -> qualify_details -> offer_appointment ->
+booking_process, resending the whole conversation every turn like Vapi does.
+
+Reports p50/p95/p99 TTFT and turn latency, turns/sec and the app's RSS growth per
+mode, printed and written as JSON so results can be compared across commits.
+
+Run from the project root:
+    python -m benchmarks.load_test --calls 200 --concurrency 50 --output load.json
+    python -m benchmarks.load_test --app-url http://127.0.0.1:8000   # an app already running
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+import uuid
+from typing import Dict, List
+import httpx
+
+# One call, turn by turn (user side)
+CALL_SCRIPT = [
+    "tuve un accidente de tránsito",
+    "fue en Córdoba capital, me llamo Ana",
+    "hubo un herido leve, me chocaron de atrás",
+    "sí, quiero agendar una cita",
+    "el martes a las 10, mi correo es ana@example.com",
+]
+
+def percentiles(values: List[float]) -> Dict[str, float | None]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    ordered = sorted(values)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99)}
+
+def rss_mb(pid: int | None) -> float | None:
+    # Linux only; None elsewhere or when the app was started outside the harness.
+    if pid is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        return None
+    return None
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def run_turn(client: httpx.AsyncClient, call_id: str, messages: List[Dict], stream: bool) -> Dict:
+    body = {"model": "vapi", "messages": messages, "stream": stream, "call": {"id": call_id}}
+    start = time.perf_counter()
+    ttft = None
+    text = ""
+    if stream:
+        async with client.stream("POST", "/chat/completions", json=body) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data: ") or line == "data: [DONE]":
+                    continue
+                content = json.loads(line[6:])["choices"][0]["delta"].get("content")
+                if content:
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+                    text += content
+    else:
+        response = await client.post("/chat/completions", json=body)
+        response.raise_for_status()
+        text = response.json()["choices"][0]["message"]["content"]
+        ttft = time.perf_counter() - start
+    return {"ttft": ttft, "latency": time.perf_counter() - start, "text": text}
+
+async def run_call(client: httpx.AsyncClient, stream: bool, turns: int, stats: Dict):
+    call_id = f"load-{uuid.uuid4().hex[:12]}"
+    messages: List[Dict] = []
+    for i in range(turns):
+        messages.append({"role": "user", "content": CALL_SCRIPT[i % len(CALL_SCRIPT)]})
+        try:
+            result = await run_turn(client, call_id, messages, stream)
+        except Exception as e:
+            stats["errors"] += 1
+            print(f"Turn error ({call_id}): {type(e).__name__}: {e}")
+            break
+        stats["turn_latency"].append(result["latency"])
+        if result["ttft"] is not None:
+            stats["ttft"].append(result["ttft"])
+        messages.append({"role": "assistant", "content": result["text"]})
+    await client.post("/vapi/events", json={"message": {"type": "end-of-call-report", "call": {"id": call_id}}})
+
+async def run_mode(app_url: str, stream: bool, calls: int, concurrency: int, turns: int, app_pid: int | None) -> Dict:
+    stats = {"ttft": [], "turn_latency": [], "errors": 0}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(client):
+        async with semaphore:
+            await run_call(client, stream, turns, stats)
+
+    rss_before = rss_mb(app_pid)
+    async with httpx.AsyncClient(base_url=app_url, limits=limits, timeout=60.0) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(limited(client) for _ in range(calls)))
+        elapsed = time.perf_counter() - start
+    rss_after = rss_mb(app_pid)
+
+    completed = len(stats["turn_latency"])
+    return {
+        "mode": "stream" if stream else "non_stream",
+        "calls": calls,
+        "turns": completed,
+        "errors": stats["errors"],
+        "duration_s": round(elapsed, 3),
+        "turns_per_sec": round(completed / elapsed, 1) if elapsed else None,
+        "ttft_ms": percentiles(stats["ttft"]),
+        "turn_latency_ms": percentiles(stats["turn_latency"]),
+        "rss_mb": {
+            "before": rss_before,
+            "after": rss_after,
+            "growth": round(rss_after - rss_before, 1) if rss_before is not None and rss_after is not None else None,
+        },
+    }
+
+async def wait_ready(app_url: str, timeout: float):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=app_url, timeout=2.0) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/health/ready")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"App at {app_url} was not ready after {timeout:.0f}s")
+
+def spawn(*args: str) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-m", "benchmarks.fakes", *args])
+
+async def main(args) -> Dict:
+    processes: List[subprocess.Popen] = []
+    app_url, app_pid = args.app_url, args.app_pid
+    try:
+        if app_url is None:
+            upstream = f"http://127.0.0.1:{args.upstream_port}"
+            processes.append(spawn(
+                "upstreams", "--port", str(args.upstream_port),
+                "--ttft-ms", str(args.ttft_ms), "--tokens-per-sec", str(args.tokens_per_sec),
+                "--slow-fraction", str(args.slow_fraction), "--slow-ttft-ms", str(args.slow_ttft_ms),
+            ))
+            app = spawn("app", "--port", str(args.app_port), "--upstream", upstream, *[f"--env={e}" for e in args.env])
+            processes.append(app)
+            app_url, app_pid = f"http://127.0.0.1:{args.app_port}", app.pid
+        await wait_ready(app_url, args.startup_timeout)
+
+        modes = {"stream": [True], "non_stream": [False], "both": [True, False]}[args.mode]
+        results = []
+        for stream in modes:
+            result = await run_mode(app_url, stream, args.calls, args.concurrency, args.turns, app_pid)
+            results.append(result)
+            print(
+                f"{result['mode']:<10} {result['turns']} turns, {result['errors']} errors, "
+                f"{result['turns_per_sec']} turns/s | TTFT {result['ttft_ms']} | "
+                f"turn {result['turn_latency_ms']} | RSS {result['rss_mb']}"
+            )
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+    return {
+        "commit": git_commit(),
+        "timestamp": int(time.time()),
+        "params": {
+            "calls": args.calls, "concurrency": args.concurrency, "turns": args.turns,
+            "ttft_ms": args.ttft_ms, "tokens_per_sec": args.tokens_per_sec,
+            "slow_fraction": args.slow_fraction, "slow_ttft_ms": args.slow_ttft_ms, "env": args.env,
+            "app_url": args.app_url,
+        },
+        "results": results,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=len(CALL_SCRIPT))
+    parser.add_argument("--mode", choices=("stream", "non_stream", "both"), default="both")
+    parser.add_argument("--ttft-ms", type=float, default=150.0, help="fake Groq time to first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=300.0, help="fake Groq generation speed")
+    parser.add_argument("--slow-fraction", type=float, default=0.0, help="share of fake Groq requests in the TTFT tail")
+    parser.add_argument("--slow-ttft-ms", type=float, default=2000.0)
+    parser.add_argument("--env", action="append", default=[], help="app setting for this run, e.g. --env SSE_COALESCE=true")
+    parser.add_argument("--app-port", type=int, default=8100)
+    parser.add_argument("--upstream-port", type=int, default=8101)
+    parser.add_argument("--app-url", default=None, help="benchmark an app that is already running instead")
+    parser.add_argument("--app-pid", type=int, default=None, help="pid of --app-url, for RSS")
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--output", default=None, help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,62 @@
+"""
+Compares per-query search latency of the Qdrant index and the in-process local index.
+
+Run from the project root after seeding:
+    python -m benchmarks.route_index --rounds 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from app.core.config import settings
+from app.services.route_index import LocalRouteIndex
+from app.services.router_service import RouterService
+
+QUERIES = [
+    "quiero hablar con una persona de verdad",
+    "me chocaron ayer en la avenida",
+    "cuánto salen los honorarios",
+    "tuve un accidente con la moto",
+    "sos un robot?",
+    "qué precio tiene la consulta",
+    "buenas tardes",
+    "necesito un abogado",
+]
+
+async def time_searches(service: RouterService, vectors, rounds: int):
+    timings, results = [], []
+    for _ in range(rounds):
+        for vector in vectors:
+            start = time.perf_counter()
+            results.append(await service.search(vector))
+            timings.append(time.perf_counter() - start)
+    return timings, results
+
+def summarize(label: str, timings):
+    timings = sorted(timings)
+    p50 = timings[len(timings) // 2] * 1000
+    p99 = timings[int(len(timings) * 0.99) - 1] * 1000
+    print(f"{label:>7}: mean {statistics.mean(timings) * 1000:.3f} ms | p50 {p50:.3f} ms | p99 {p99:.3f} ms")
+
+async def main(rounds: int):
+    service = RouterService(index_mode="qdrant")
+    # Encode once up front: only the index lookup is being compared.
+    vectors = service.encoder(QUERIES)
+
+    qdrant_timings, qdrant_results = await time_searches(service, vectors, rounds)
+
+    service.local_index = LocalRouteIndex.from_qdrant(service.qdrant_client, settings.QDRANT_COLLECTION)
+    local_timings, local_results = await time_searches(service, vectors, rounds)
+
+    print(f"{len(service.local_index)} route vectors, {len(QUERIES)} queries x {rounds} rounds")
+    summarize("qdrant", qdrant_timings)
+    summarize("local", local_timings)
+    mismatches = sum(a != b for a, b in zip(qdrant_results, local_results))
+    print(f"route mismatches between modes: {mismatches}")
+    await service.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.rounds))
@@ -0,0 +1,82 @@
+"""
+Microbenchmark of the SSE path to Vapi: per-token framing cost of the old dict +
+json.dumps encoder vs. the pre-rendered SSEEncoder, and how many frames/bytes a reply
+turns into with and without sentence-aware coalescing.
+
+Run from the project root:
+    python -m benchmarks.sse_encoding --frames 200000 --token-delay-ms 2
+"""
+import argparse
+import asyncio
+import json
+import time
+from app.api.sse import SSEEncoder, coalesce, orjson
+
+MODEL = "llama-3.1-70b-versatile"
+
+# A typical reply, split the way Groq streams it (one short delta per token)
+REPLY = (
+    "Entiendo, lamento mucho lo que le pasó. Para poder ayudarle, necesito algunos datos: "
+    "¿en qué ciudad ocurrió el accidente? Y, si puede, cuénteme si hubo heridos, "
+    "porque eso cambia bastante el tipo de reclamo que podemos iniciar."
+)
+TOKENS = [word + " " for word in REPLY.split(" ")]
+
+def legacy_frame(text: str) -> str:
+    data = {
+        "id": f"chatcmpl-{int(time.time())}",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": MODEL,
+        "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": None}],
+    }
+    return f"data: {json.dumps(data)}\n\n"
+
+def bench_encoding(frames: int):
+    encoder = SSEEncoder(MODEL)
+    for name, encode in (("legacy dict+json.dumps", legacy_frame), ("SSEEncoder", encoder.content)):
+        start = time.perf_counter()
+        for i in range(frames):
+            encode(TOKENS[i % len(TOKENS)])
+        elapsed = time.perf_counter() - start
+        print(f"{name:<24} {frames / elapsed:>12,.0f} frames/s | {elapsed / frames * 1e6:.2f} us/frame")
+
+async def token_stream(delay: float):
+    for token in TOKENS:
+        if delay:
+            await asyncio.sleep(delay)
+        yield token
+
+async def bench_coalescing(token_delay: float, max_delay: float, min_chars: int):
+    encoder = SSEEncoder(MODEL)
+    for name, coalesced in (("per-token", False), ("coalesced", True)):
+        stream = token_stream(token_delay)
+        if coalesced:
+            stream = coalesce(stream, max_delay, min_chars)
+        start = time.perf_counter()
+        first = None
+        frames = total_bytes = 0
+        async for text in stream:
+            if first is None:
+                first = time.perf_counter() - start
+            frames += 1
+            total_bytes += len(encoder.content(text))
+        elapsed = time.perf_counter() - start
+        print(
+            f"{name:<10} {frames:>4} frames | {total_bytes:>6} bytes | "
+            f"first frame {first * 1000:.1f} ms | stream {elapsed * 1000:.1f} ms"
+        )
+
+def main(args):
+    print(f"JSON string encoder: {'orjson' if orjson is not None else 'json'}")
+    bench_encoding(args.frames)
+    print(f"\nOne reply of {len(TOKENS)} tokens, {args.token_delay_ms} ms between tokens:")
+    asyncio.run(bench_coalescing(args.token_delay_ms / 1000, args.max_delay_ms / 1000, args.min_chars))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=200_000)
+    parser.add_argument("--token-delay-ms", type=float, default=2.0)
+    parser.add_argument("--max-delay-ms", type=float, default=200.0)
+    parser.add_argument("--min-chars", type=int, default=20)
+    main(parser.parse_args())
@@ -1,15 +1,45 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app.api.vapi_router import router as vapi_router
 from app.core.config import settings
+from app.core.lifecycle import lifecycle
+from app.core.metrics import render_metrics
 
-app = FastAPI(title="Vapi Custom LLM Server")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Resources are built and warmed up in the background; /health/ready reports when done.
+    lifecycle.start()
+    yield
+    await lifecycle.stop()
+
+app = FastAPI(title="Vapi Custom LLM Server", lifespan=lifespan)
 
 app.include_router(vapi_router)
 
 @app.get("/health")
 def health_check():
+    # Liveness: the process is up and serving, even while still warming up (or retrying
+    # it); fails only once startup has given up, so the orchestrator restarts the pod.
+    if lifecycle.error:
+        return JSONResponse({"status": "failed", "error": lifecycle.error, "version": "0.1.0"}, status_code=503)
     return {"status": "ok", "version": "0.1.0"}
 
+@app.get("/health/ready")
+def readiness_check():
+    body = {
+        "status": "ready" if lifecycle.ready else ("failed" if lifecycle.error else "starting"),
+        "startup_seconds": lifecycle.timings,
+    }
+    if lifecycle.error:
+        body["error"] = lifecycle.error
+    return JSONResponse(body, status_code=200 if lifecycle.ready else 503)
+
+@app.get("/metrics")
+def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -1,84 +1,72 @@
-import os
-from semantic_router import Route
-from semantic_router.encoders import HuggingFaceEncoder
-from semantic_router.layer import RouteLayer
-from semantic_router.index.qdrant import QdrantIndex
+import argparse
 from qdrant_client import QdrantClient
+from semantic_router.index.qdrant import SR_ROUTE_PAYLOAD_KEY
 from app.core.config import settings
+from app.services.encoders import create_encoder, ensure_onnx_export
+from app.services.route_catalog import IndexSync, load_routes
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def seed():
+def export_encoder():
+    """
+    Exports the ONNX encoder when ROUTER_ENCODER_BACKEND=onnx; the server only loads it.
+    """
+    if settings.ROUTER_ENCODER_BACKEND == "onnx":
+        model_dir = ensure_onnx_export(settings.ROUTER_ENCODER_MODEL, quantize=settings.ROUTER_ONNX_QUANTIZE)
+        print(f"ONNX encoder ready in {model_dir}")
+
+def seed(routes_path: str = "routes.json", batch_size: int = 64, dry_run: bool = False):
     print(f"Connecting to Qdrant at {settings.QDRANT_URL}...")
-    
-    # Define Routes with utterances
-    handoff_route = Route(
-        name="human_handoff",
-        utterances=[
-            "quiero hablar con un humano",
-            "pásame con una persona",
-            "no eres real",
-            "dame con un agente",
-            "necesito soporte real",
-            "transferirme"
-        ]
-    )
-    
-    traffic_route = Route(
-        name="legal_issue_traffic",
-        utterances=[
-            "tuve un accidente de tránsito",
-            "me chocaron el auto",
-            "choque en la ruta",
-            "necesito un abogado por un accidente",
-            "tengo un problema legal de transito",
-            "accidente con lesionados",
-            "me atropellaron"
-        ]
-    )
 
-    pricing_route = Route(
-        name="pricing_info",
-        utterances=[
-            "cuánto cuesta",
-            "cuál es el precio",
-            "tienen planes gratuitos?",
-            "dime las tarifas",
-            "costo del servicio",
-            "honorarios"
-        ]
-    )
-    
-    routes = [handoff_route, traffic_route, pricing_route]
+    # Routes and utterances come from the catalogue file
+    routes = load_routes(routes_path)
+    print(f"Loaded {sum(len(u) for u in routes.values())} utterances in {len(routes)} routes from {routes_path}")
+
+    # Initialize Encoder (must match what is used in app: same ROUTER_ENCODER_BACKEND).
+    export_encoder()
+    encoder = create_encoder()
 
-    # Initialize Encoder (must match what is used in app)
-    encoder = HuggingFaceEncoder()
-    
     # Initialize Qdrant Client
     qdrant_client = QdrantClient(
         url=settings.QDRANT_URL,
         api_key=settings.QDRANT_API_KEY,
     )
-    
-    # Initialize Index
-    # Note: If collection exists, we might want to recreate it to be clean, 
-    # but RouteLayer usually handles upserts.
-    index = QdrantIndex(
-        client=qdrant_client, 
-        collection_name=settings.QDRANT_COLLECTION,
-    )
-    
-    # Create RouteLayer to trigger embedding and indexing
-    print("Indexing routes...")
-    rl = RouteLayer(encoder=encoder, index=index, routes=routes)
-    
-    print("Seeding complete!")
-    
+
+    # Only new or changed utterances are embedded; removed ones are deleted.
+    sync = IndexSync(qdrant_client, encoder, settings.QDRANT_COLLECTION, batch_size=batch_size)
+    to_add, to_delete = sync.plan(routes)
+    print(f"Changes: {len(to_add)} to embed and upsert, {len(to_delete)} to delete")
+    if dry_run:
+        return
+
+    version = sync.apply(to_add, to_delete)
+    if version is None:
+        print("Index already up to date.")
+    else:
+        # Running servers poll this marker and reload their routes without a restart.
+        print(f"Seeding complete! Index version {version}")
+
     # Quick Test
     test_phrase = "quiero saber los precios"
-    res = rl(test_phrase)
-    print(f"Test '{test_phrase}' -> {res.name}")
+    response = qdrant_client.query_points(
+        collection_name=settings.QDRANT_COLLECTION,
+        query=encoder([test_phrase])[0],
+        limit=1,
+        with_payload=[SR_ROUTE_PAYLOAD_KEY],
+    )
+    if response.points:
+        top = response.points[0]
+        print(f"Test '{test_phrase}' -> {top.payload.get(SR_ROUTE_PAYLOAD_KEY)} ({top.score:.3f})")
 
 if __name__ == "__main__":
-    seed()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--routes", default="routes.json", help="route catalogue (JSON)")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--dry-run", action="store_true", help="only print what would change")
+    parser.add_argument("--export-only", action="store_true", help="only export the ONNX encoder (build time)")
+    args = parser.parse_args()
+    if args.export_only:
+        export_encoder()
+    else:
+        seed(args.routes, args.batch_size, args.dry_run)
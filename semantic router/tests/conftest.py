@@ -0,0 +1,79 @@
+import os
+import socket
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+import pytest
+
+# Run from anywhere: the app is imported as the top-level `app` package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Required settings; the tests never reach the real services.
+for key, value in {
+    "GROQ_API_KEY": "test",
+    "QDRANT_URL": "http://127.0.0.1:1",
+    "QDRANT_API_KEY": "test",
+    "LANGFUSE_SECRET_KEY": "test",
+    "LANGFUSE_PUBLIC_KEY": "test",
+}.items():
+    os.environ.setdefault(key, value)
+
+@contextmanager
+def serve(asgi_app) -> Iterator[str]:
+    """
+    Runs an ASGI app on a free local port in a background thread; yields its base URL.
+    """
+    import uvicorn
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(asgi_app, log_level="warning"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{sock.getsockname()[1]}"
+    finally:
+        server.should_exit = True
+        thread.join(5)
+
+@pytest.fixture(scope="session")
+def upstreams() -> Iterator[str]:
+    """
+    The offline fake Groq / Qdrant / Langfuse server from benchmarks/fakes.py.
+    """
+    from benchmarks.fakes import create_upstreams
+    routes = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "routes.json")
+    with serve(create_upstreams(ttft=0.1, tokens_per_sec=200, routes_path=routes)) as url:
+        yield url
+
+@pytest.fixture
+def fake_services(monkeypatch, upstreams) -> str:
+    """
+    Points the app's clients at the fake upstreams, with the hashing encoder in place of
+    the HuggingFace model.
+    """
+    from app.core.config import settings
+    from benchmarks.fakes import HashingEncoder
+    monkeypatch.setattr(settings, "GROQ_BASE_URL", upstreams)
+    monkeypatch.setattr(settings, "QDRANT_URL", upstreams)
+    monkeypatch.setattr(settings, "LANGFUSE_HOST", upstreams)
+    monkeypatch.setattr(settings, "ROUTER_ENCODER_BACKEND", "torch")
+    monkeypatch.setattr("app.services.encoders.HuggingFaceEncoder", HashingEncoder)
+    return upstreams
+
+@pytest.fixture
+def app_url(fake_services) -> Iterator[str]:
+    """
+    main:app served against the fake upstreams, once /health/ready says it is warm.
+    """
+    import httpx
+    import main
+    with serve(main.app) as url:
+        deadline = time.monotonic() + 30
+        while httpx.get(f"{url}/health/ready").status_code != 200:
+            assert time.monotonic() < deadline, "app did not become ready"
+            time.sleep(0.05)
+        yield url
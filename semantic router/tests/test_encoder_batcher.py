@@ -0,0 +1,65 @@
+import asyncio
+import gc
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from app.services.encoder_batcher import EncoderBatcher
+
+class BlockingEncoder:
+    """
+    Encodes only once released, so batches stay in flight as long as the test needs.
+    """
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.batches = []
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        self.started.set()
+        self.release.wait(5)
+        return [[float(len(text))] for text in texts]
+
+@pytest.fixture
+def executor():
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        yield pool
+
+def test_in_flight_batches_are_kept_and_complete(executor):
+    encoder = BlockingEncoder()
+    batcher = EncoderBatcher(encoder, executor, max_batch_size=8, max_wait_ms=5)
+
+    async def main():
+        calls = asyncio.gather(*(batcher.encode(text) for text in ("a", "bb", "ccc")))
+        await asyncio.to_thread(encoder.started.wait, 5)
+        in_flight = len(batcher._batches)
+        gc.collect()  # an unreferenced batch task could be collected here
+        encoder.release.set()
+        vectors = await calls
+        await asyncio.sleep(0)
+        remaining = len(batcher._batches)
+        await batcher.close()
+        return in_flight, remaining, vectors
+
+    in_flight, remaining, vectors = asyncio.run(main())
+    assert in_flight == 1
+    assert remaining == 0
+    assert vectors == [[1.0], [2.0], [3.0]]
+    assert encoder.batches == [["a", "bb", "ccc"]]
+
+def test_close_cancels_in_flight_batches(executor):
+    encoder = BlockingEncoder()
+    batcher = EncoderBatcher(encoder, executor, max_batch_size=8, max_wait_ms=5)
+
+    async def main():
+        pending = asyncio.ensure_future(batcher.encode("hola"))
+        await asyncio.to_thread(encoder.started.wait, 5)
+        await batcher.close()
+        assert not batcher._batches
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(pending, 1)
+
+    try:
+        asyncio.run(main())
+    finally:
+        encoder.release.set()
@@ -0,0 +1,13 @@
+import pytest
+from app.services import encoders
+
+def test_onnx_encoder_never_exports_at_serve_time(tmp_path, monkeypatch):
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("tokenizers")
+
+    def export(*args, **kwargs):
+        raise AssertionError("the server must not export the model")
+
+    monkeypatch.setattr(encoders, "export_onnx", export)
+    with pytest.raises(FileNotFoundError, match="seed_router.py --export-only"):
+        encoders.OnnxEncoder("sentence-transformers/all-MiniLM-L6-v2", model_dir=str(tmp_path))
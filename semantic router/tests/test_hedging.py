@@ -0,0 +1,68 @@
+import asyncio
+import pytest
+from app.core.admission import Limiter
+from app.core.config import settings
+from app.services import llm_service
+from app.services.llm_service import LLM_HEDGES, SmartLLMService
+
+class PeakLimiter(Limiter):
+    """
+    Limiter that records the most slots it ever had taken at once.
+    """
+    peak = 0
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name == "active":
+            self.peak = max(self.peak, value)
+
+@pytest.fixture
+def llm(fake_services, monkeypatch):
+    # The fake's 100 ms first token is always slower than the hedge delay.
+    monkeypatch.setattr(settings, "LLM_HEDGE_AFTER_MS", 20.0)
+    return SmartLLMService(router_service=None)
+
+def use_limit(monkeypatch, max_concurrency: int) -> PeakLimiter:
+    limit = PeakLimiter("groq", max_concurrency, max_queue=16, queue_timeout=5.0)
+    monkeypatch.setattr(llm_service, "groq_limit", limit)
+    return limit
+
+def run_streams(llm: SmartLLMService, count: int):
+    async def consume(i):
+        return "".join([chunk async for chunk in llm.get_response_stream(text=f"hola {i}", system_message="Responde breve.")])
+
+    async def main():
+        try:
+            return await asyncio.gather(*(consume(i) for i in range(count)))
+        finally:
+            await llm.close()
+
+    return asyncio.run(main())
+
+def hedges(outcome: str) -> float:
+    return LLM_HEDGES.value(outcome=outcome)
+
+def test_hedge_takes_a_slot_and_gives_it_back(llm, monkeypatch):
+    limit = use_limit(monkeypatch, max_concurrency=2)
+    fired = hedges("fired")
+
+    replies = run_streams(llm, 1)
+
+    assert replies[0]
+    assert hedges("fired") == fired + 1
+    assert limit.peak == 2
+    assert limit.active == 0
+
+def test_saturated_limit_skips_the_hedge(llm, monkeypatch):
+    limit = use_limit(monkeypatch, max_concurrency=2)
+    fired, skipped = hedges("fired"), hedges("skipped")
+
+    # Both slots are taken by primaries (a third waits in the queue): no room for hedges.
+    replies = run_streams(llm, 3)
+
+    assert all(replies)
+    assert limit.peak <= limit.max_concurrency
+    assert hedges("skipped") >= skipped + 2
+    assert limit.active == 0
+    # Only the last stream, alone once the others finished, may have found a free slot.
+    assert hedges("fired") <= fired + 1
@@ -0,0 +1,40 @@
+import asyncio
+from app.flows.history import HistoryManager
+from app.flows.manager import FlowInstance
+
+class SummaryLLM:
+    def __init__(self):
+        self.calls = []
+
+    async def summarize(self, messages, previous_summary=""):
+        self.calls.append(len(messages))
+        return "El usuario tuvo un accidente en Córdoba."
+
+def run_call(manager: HistoryManager, turns: int, words: int) -> tuple:
+    async def main():
+        llm = SummaryLLM()
+        flow = FlowInstance("call", llm)
+        for i in range(turns):
+            flow.history.append({"role": "user", "content": " ".join(["palabra"] * words)})
+            flow.history.append({"role": "assistant", "content": " ".join(["respuesta"] * words)})
+            manager.schedule_compaction(flow)
+            if flow._summary_task is not None:
+                await flow._summary_task
+        return llm.calls, flow
+    return asyncio.run(main())
+
+def test_short_calls_are_never_summarized():
+    manager = HistoryManager(token_budget=1500, recent_turns=4)
+    calls, flow = run_call(manager, turns=12, words=5)
+    assert calls == []
+    assert len(flow.history) == 24
+
+def test_long_calls_fold_several_turns_per_summary():
+    manager = HistoryManager(token_budget=1500, recent_turns=4, compact_min_turns=4)
+    # ~100 tokens per message: the budget threshold is crossed after a few turns.
+    calls, flow = run_call(manager, turns=24, words=50)
+    assert 0 < len(calls) <= 24 // 4
+    assert all(messages >= 8 for messages in calls)
+    assert flow.summary
+    prompt = manager.build_prompt_history(flow)
+    assert sum(len(m["content"]) // 4 + 5 for m in prompt) <= 1500
@@ -0,0 +1,49 @@
+import pytest
+from app.services.route_cache import normalize_text
+from app.services.router_service import RouterService, compile_lexical_routes
+
+HANDOFF = [
+    "Quiero hablar con un humano",
+    "¿Puedo hablar con una operadora?",
+    "necesito hablar con alguien",
+    "quiero hablar con una persona",
+    "quiero hablar con una persona de verdad",
+    "¿Sos una persona real?",
+    "Páseme con una persona, por favor",
+    "pasame con alguien del estudio",
+    "comuníqueme con un operador",
+    "¿No eres real, no?",
+]
+
+# Accident reports and case details that must reach the semantic router untouched.
+NOT_HANDOFF = [
+    "Me chocaron y vino un agente de tránsito",
+    "fue un error humano del otro conductor",
+    "el operador de la grúa se llevó el auto",
+    "un agente de la aseguradora me llamó",
+    "tengo que hablar con un agente de seguros",
+    "me transfirieron al hospital de urgencias",
+    "la persona que me chocó no tenía seguro",
+    "necesito hablar con alguien sobre el accidente de mi hijo",
+    "la camioneta era de un operador turístico",
+    "hubo un herido, una persona mayor",
+    "me pasó con el auto de un amigo",
+]
+
+@pytest.fixture
+def router() -> RouterService:
+    # Only the lexical matcher; no encoder or Qdrant client is built.
+    service = RouterService.__new__(RouterService)
+    service.lexical_routes = compile_lexical_routes()
+    return service
+
+@pytest.mark.parametrize("text", HANDOFF)
+def test_handoff_phrases_skip_the_encoder(router, text):
+    assert router.match_lexical(normalize_text(text)) == "human_handoff"
+
+@pytest.mark.parametrize("text", NOT_HANDOFF)
+def test_case_details_are_not_handoffs(router, text):
+    assert router.match_lexical(normalize_text(text)) is None
+
+def test_scoped_out_route_is_not_matched(router):
+    assert router.match_lexical(normalize_text("quiero hablar con un humano"), routes=["legal_issue_traffic"]) is None
@@ -0,0 +1,90 @@
+import threading
+import time
+import httpx
+import pytest
+from app.core.config import settings
+from app.core.lifecycle import STARTUP_FAILURES, Lifecycle
+from conftest import serve
+
+def wait_for(url: str, status_code: int, timeout: float = 30.0) -> httpx.Response:
+    deadline = time.monotonic() + timeout
+    while True:
+        response = httpx.get(url)
+        if response.status_code == status_code:
+            return response
+        assert time.monotonic() < deadline, f"{url} never answered {status_code}"
+        time.sleep(0.05)
+
+@pytest.fixture
+def fresh_lifecycle(fake_services, monkeypatch) -> Lifecycle:
+    import main
+    lifecycle = Lifecycle()
+    monkeypatch.setattr(main, "lifecycle", lifecycle)
+    monkeypatch.setattr(settings, "STARTUP_RETRY_BACKOFF", 0.05)
+    return lifecycle
+
+def failing_flow_manager(monkeypatch, failures: int, gate: threading.Event | None = None):
+    """
+    Makes the first `failures` FlowManager builds raise; returns the list of build attempts.
+    With a `gate`, every attempt after the first waits for it before going on.
+    """
+    from app.flows import manager
+    real, attempts = manager.FlowManager, []
+
+    def build():
+        attempts.append(time.monotonic())
+        if gate is not None and len(attempts) > 1:
+            # Runs in a worker thread (asyncio.to_thread), so blocking here is safe.
+            gate.wait(10)
+        if len(attempts) <= failures:
+            raise ConnectionError("qdrant unreachable")
+        return real()
+
+    monkeypatch.setattr(manager, "FlowManager", build)
+    return attempts
+
+def test_failed_startup_is_retried(fresh_lifecycle, monkeypatch):
+    import main
+    monkeypatch.setattr(settings, "STARTUP_RETRY_ATTEMPTS", 3)
+    attempts = failing_flow_manager(monkeypatch, failures=2)
+    failures = STARTUP_FAILURES.value(stage="build_flow_manager")
+
+    with serve(main.app) as url:
+        wait_for(f"{url}/health/ready", 200)
+        assert httpx.get(f"{url}/health").status_code == 200
+
+    assert len(attempts) == 3
+    assert STARTUP_FAILURES.value(stage="build_flow_manager") == failures + 2
+    # Exponential backoff between attempts
+    assert attempts[2] - attempts[1] >= 2 * settings.STARTUP_RETRY_BACKOFF * 0.9
+
+def test_liveness_fails_once_startup_gives_up(fresh_lifecycle, monkeypatch):
+    import main
+    monkeypatch.setattr(settings, "STARTUP_RETRY_ATTEMPTS", 1)
+    gate = threading.Event()
+    attempts = failing_flow_manager(monkeypatch, failures=10, gate=gate)
+
+    with serve(main.app) as url:
+        try:
+            # The last attempt is held at the gate: still retrying, so still alive.
+            deadline = time.monotonic() + 10
+            while len(attempts) < 2:
+                assert time.monotonic() < deadline, "startup was not retried"
+                time.sleep(0.01)
+            assert httpx.get(f"{url}/health").status_code == 200
+            assert fresh_lifecycle.error is None
+        finally:
+            gate.set()
+        deadline = time.monotonic() + 10
+        while fresh_lifecycle.error is None:
+            assert time.monotonic() < deadline, "startup never gave up"
+            time.sleep(0.01)
+        # Every attempt has failed: liveness fails so the orchestrator restarts the pod.
+        health = httpx.get(f"{url}/health")
+        ready = httpx.get(f"{url}/health/ready")
+
+    assert health.status_code == 503
+
+    assert len(attempts) == 2
+    assert "qdrant unreachable" in health.json()["error"]
+    assert ready.status_code == 503 and ready.json()["status"] == "failed"
@@ -0,0 +1,73 @@
+import asyncio
+import time
+import pytest
+from app.core.config import settings
+from app.services.llm_service import SmartLLMService
+
+CONCURRENT_STREAMS = 8
+
+@pytest.fixture
+def llm(fake_services, monkeypatch):
+    # Plain streaming: no hedges against the fake server
+    monkeypatch.setattr(settings, "LLM_HEDGE_AFTER_MS", 0.0)
+    return SmartLLMService(router_service=None)
+
+async def timed_streams(llm: SmartLLMService, count: int):
+    """
+    Runs `count` streams at once; returns the wall time and (stream, chunk) arrival order.
+    """
+    arrivals = []
+
+    async def consume(i):
+        async for chunk in llm.get_response_stream(text=f"hola {i}", system_message="Responde breve."):
+            arrivals.append(i)
+        return i
+
+    start = time.perf_counter()
+    await asyncio.gather(*(consume(i) for i in range(count)))
+    return time.perf_counter() - start, arrivals
+
+def test_interleaved_streams_do_not_serialize(llm):
+    async def main():
+        try:
+            single, _ = await timed_streams(llm, 1)
+            total, arrivals = await timed_streams(llm, CONCURRENT_STREAMS)
+            return single, total, arrivals
+        finally:
+            await llm.close()
+
+    single, total, arrivals = asyncio.run(main())
+    assert total < 2 * single
+    # Chunks of different streams arrive interleaved, not one stream after the other.
+    first_of_last = arrivals.index(CONCURRENT_STREAMS - 1)
+    last_of_first = len(arrivals) - 1 - arrivals[::-1].index(0)
+    assert first_of_last < last_of_first
+
+def test_streams_share_the_connection_pool(llm):
+    async def main():
+        try:
+            await timed_streams(llm, CONCURRENT_STREAMS)
+            await timed_streams(llm, CONCURRENT_STREAMS)
+            pool = llm.http_client._transport._pool
+            return len(pool.connections)
+        finally:
+            await llm.close()
+
+    # Keep-alive: the second wave reuses the first wave's connections.
+    assert asyncio.run(main()) <= CONCURRENT_STREAMS
+
+def test_legacy_sync_client_serializes_streams(llm, monkeypatch):
+    # The blocking client this replaced, kept behind GROQ_ASYNC=False: each stream
+    # holds the event loop, so concurrent streams add up.
+    llm.use_async = False
+
+    async def main():
+        try:
+            single, _ = await timed_streams(llm, 1)
+            total, _ = await timed_streams(llm, 4)
+            return single, total
+        finally:
+            await llm.close()
+
+    single, total = asyncio.run(main())
+    assert total > 3 * single
@@ -0,0 +1,111 @@
+import asyncio
+import time
+import pytest
+from langfuse import Langfuse
+from app.flows import nodes
+from app.flows.prompts import PROMPT_LOOKUPS, PromptCache
+from benchmarks.fakes import create_upstreams
+from conftest import serve
+
+PROMPT = "root_greeting_system"
+DEFAULT = "texto por defecto"
+
+@pytest.fixture
+def langfuse(monkeypatch):
+    """
+    A fake Langfuse of its own, so tests can change its prompts and availability.
+    """
+    fake = create_upstreams(ttft=0.1, tokens_per_sec=200)
+    with serve(fake) as url:
+        # The SDK shares one client per public key: a key per server keeps them apart.
+        monkeypatch.setattr(nodes, "_langfuse", Langfuse(secret_key="test", public_key=f"test-{url}", host=url))
+        fetches = []
+
+        def fetch(prompt_name):
+            fetches.append(prompt_name)
+            return nodes._fetch_langfuse_prompt(prompt_name)
+
+        yield fake.state, fetch, fetches
+
+def test_preloaded_prompt_is_served_from_memory(langfuse):
+    state, fetch, fetches = langfuse
+    cache = PromptCache(fetch=fetch, ttl=60)
+
+    async def main():
+        await cache.preload([PROMPT])
+        # Langfuse slowing down afterwards doesn't reach the turn.
+        state.langfuse_delay = 1.0
+        start = time.perf_counter()
+        text = cache.get(PROMPT, DEFAULT)
+        return text, time.perf_counter() - start
+
+    text, elapsed = asyncio.run(main())
+    assert "v1" in text
+    assert cache.version(PROMPT) == 1
+    assert elapsed < 0.01
+    assert fetches == [PROMPT]
+
+def test_stale_prompt_is_served_while_revalidating(langfuse):
+    state, fetch, fetches = langfuse
+    cache = PromptCache(fetch=fetch, ttl=0.05)
+
+    async def main():
+        await cache.preload([PROMPT])
+        state.prompt_versions[PROMPT] = 2
+        state.langfuse_delay = 0.1
+        await asyncio.sleep(0.06)
+        start = time.perf_counter()
+        stale = cache.get(PROMPT, DEFAULT)
+        elapsed = time.perf_counter() - start
+        await cache._refreshing[PROMPT]
+        return stale, elapsed, cache.get(PROMPT, DEFAULT)
+
+    stale_before = PROMPT_LOOKUPS.value(result="stale")
+    stale, elapsed, fresh = asyncio.run(main())
+    assert "v1" in stale
+    assert elapsed < 0.01
+    assert "v2" in fresh
+    assert cache.version(PROMPT) == 2
+    assert PROMPT_LOOKUPS.value(result="stale") > stale_before
+
+def test_unreachable_langfuse_falls_back_and_backs_off(langfuse):
+    state, fetch, fetches = langfuse
+    state.langfuse_down = True
+    cache = PromptCache(fetch=fetch, ttl=60)
+
+    async def main():
+        await cache.preload([PROMPT])
+        texts = [cache.get(PROMPT, DEFAULT) for _ in range(5)]
+        await asyncio.sleep(0)
+        return texts
+
+    texts = asyncio.run(main())
+    assert texts == [DEFAULT] * 5
+    # One failed fetch at preload; the turns after it don't retry within the TTL.
+    assert fetches == [PROMPT]
+
+def test_cached_prompt_survives_an_outage(langfuse):
+    state, fetch, fetches = langfuse
+    cache = PromptCache(fetch=fetch, ttl=0.05)
+
+    async def main():
+        await cache.preload([PROMPT])
+        state.langfuse_down = True
+        await asyncio.sleep(0.06)
+        cache.get(PROMPT, DEFAULT)
+        await cache._refreshing[PROMPT]
+        return cache.get(PROMPT, DEFAULT)
+
+    assert "v1" in asyncio.run(main())
+    assert len(fetches) == 2
+
+def test_disabled_cache_serves_defaults(langfuse):
+    _, fetch, fetches = langfuse
+    cache = PromptCache(fetch=fetch, ttl=60, enabled=False)
+
+    async def main():
+        await cache.preload([PROMPT])
+        return cache.get(PROMPT, DEFAULT)
+
+    assert asyncio.run(main()) == DEFAULT
+    assert fetches == []
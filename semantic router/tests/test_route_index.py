@@ -0,0 +1,53 @@
+import asyncio
+from app.core.config import settings
+from app.services.route_index import LocalRouteIndex
+from app.services.router_service import RouterService
+
+def local_router(monkeypatch, path) -> RouterService:
+    monkeypatch.setattr(settings, "ROUTER_LOCAL_INDEX_PATH", str(path))
+    monkeypatch.setattr(settings, "ROUTER_INDEX_POLL_INTERVAL", 0)
+    return RouterService(index_mode="local")
+
+def test_snapshot_keeps_the_index_version(tmp_path):
+    path = tmp_path / "routes.npz"
+    LocalRouteIndex([[1.0, 0.0]], ["a"], version="abc").save(str(path))
+    assert LocalRouteIndex.load(str(path)).version == "abc"
+
+def test_stale_snapshot_is_replaced_from_qdrant_at_start(monkeypatch, tmp_path, fake_services):
+    path = tmp_path / "routes.npz"
+    # Written before the last reseed: one vector, an old version.
+    LocalRouteIndex([[1.0] * 256], ["human_handoff"], version="old").save(str(path))
+
+    async def main():
+        router = local_router(monkeypatch, path)
+        assert len(router.local_index) == 1
+        await router.start()
+        try:
+            return router.local_index
+        finally:
+            await router.close()
+
+    index = asyncio.run(main())
+    assert len(index) > 1
+    assert index.version != "old"
+    # The file is rewritten with the current version.
+    assert LocalRouteIndex.load(str(path)).version == index.version
+
+def test_current_snapshot_is_served_as_is(monkeypatch, tmp_path, fake_services):
+    path = tmp_path / "routes.npz"
+
+    async def main():
+        # The first start pulls from Qdrant and writes the snapshot.
+        router = local_router(monkeypatch, path)
+        await router.close()
+        router = local_router(monkeypatch, path)
+        loaded = router.local_index
+        await router.start()
+        try:
+            return loaded, router.local_index
+        finally:
+            await router.close()
+
+    loaded, served = asyncio.run(main())
+    assert loaded.version is not None
+    assert served is loaded
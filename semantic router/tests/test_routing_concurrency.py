@@ -0,0 +1,45 @@
+import asyncio
+import time
+import httpx
+import pytest
+from benchmarks.fakes import HashingEncoder
+
+# Cost of one blocking encoder forward pass, like the HuggingFace model's on CPU
+ENCODE_SECONDS = 0.3
+CONCURRENT_CALLS = 10
+
+class SlowEncoder(HashingEncoder):
+    def __call__(self, docs):
+        time.sleep(ENCODE_SECONDS)
+        return super().__call__(docs)
+
+@pytest.fixture
+def fake_services(fake_services, monkeypatch):
+    monkeypatch.setattr("app.services.encoders.HuggingFaceEncoder", SlowEncoder)
+    return fake_services
+
+async def turn(client: httpx.AsyncClient, call_id: str, text: str) -> float:
+    start = time.perf_counter()
+    response = await client.post("/chat/completions", json={
+        "model": "fake", "call": {"id": call_id}, "messages": [{"role": "user", "content": text}],
+    })
+    response.raise_for_status()
+    assert response.json()["choices"][0]["message"]["content"]
+    return time.perf_counter() - start
+
+def test_concurrent_turns_take_about_one_routing_call(app_url):
+    async def main():
+        async with httpx.AsyncClient(base_url=app_url, timeout=30) as client:
+            # Distinct texts: no route or response cache hits.
+            single = await turn(client, "alone", "tuve un accidente con el auto")
+            start = time.perf_counter()
+            await asyncio.gather(*(
+                turn(client, f"call-{i}", f"tuve un accidente con la moto numero {i}") for i in range(CONCURRENT_CALLS)
+            ))
+            return single, time.perf_counter() - start
+
+    single, total = asyncio.run(main())
+    assert single >= ENCODE_SECONDS
+    # Serialized routing would take CONCURRENT_CALLS encoder passes.
+    assert total < 2 * single
+    assert total < CONCURRENT_CALLS * ENCODE_SECONDS / 3
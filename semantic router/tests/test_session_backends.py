@@ -0,0 +1,92 @@
+import asyncio
+import sys
+import types
+import pytest
+from app.flows.session_backends import RedisSessionBackend, SessionConflict, SQLiteSessionBackend
+
+class FakeRedis:
+    """
+    The few redis.asyncio calls the backend makes, over a dict of hashes. The save
+    script is replayed in Python with the same compare-and-set as _REDIS_SAVE_SCRIPT.
+    """
+    def __init__(self):
+        self.hashes = {}
+        self.expiry = {}
+
+    async def hmget(self, key, *fields):
+        entry = self.hashes.get(key, {})
+        return [entry.get(field) for field in fields]
+
+    def register_script(self, script):
+        async def save(keys, args):
+            key, (expected, data, ttl) = keys[0], args
+            current = int(self.hashes.get(key, {}).get("v", 0))
+            if current != int(expected):
+                return -1
+            self.hashes[key] = {"v": str(current + 1).encode(), "d": data}
+            self.expiry[key] = ttl
+            return current + 1
+        return save
+
+    async def delete(self, key):
+        self.hashes.pop(key, None)
+
+    async def aclose(self):
+        pass
+
+@pytest.fixture
+def redis_backend(monkeypatch) -> RedisSessionBackend:
+    client = FakeRedis()
+    redis_asyncio = types.SimpleNamespace(from_url=lambda url: client)
+    monkeypatch.setitem(sys.modules, "redis", types.SimpleNamespace(asyncio=redis_asyncio))
+    monkeypatch.setitem(sys.modules, "redis.asyncio", redis_asyncio)
+    return RedisSessionBackend("redis://fake", ttl=60)
+
+@pytest.fixture
+def sqlite_backends(tmp_path):
+    # Two workers sharing the same database file
+    path = str(tmp_path / "sessions.db")
+    backends = SQLiteSessionBackend(path, ttl=60), SQLiteSessionBackend(path, ttl=60)
+    yield backends
+    for backend in backends:
+        asyncio.run(backend.close())
+
+async def stale_save_round_trip(first, second):
+    """
+    Two workers load the same session; the first one saves, then the second one saves
+    on top of the version it loaded, which is no longer current.
+    """
+    assert await first.load("call") == (None, 0)
+    assert await first.save("call", b"turn-0", 0) == 1
+
+    data_a, version_a = await first.load("call")
+    data_b, version_b = await second.load("call")
+    assert (data_a, version_a) == (data_b, version_b) == (b"turn-0", 1)
+
+    assert await first.save("call", b"turn-1a", version_a) == 2
+    with pytest.raises(SessionConflict):
+        await second.save("call", b"turn-1b", version_b)
+    # A second insert of a new session is a conflict too.
+    with pytest.raises(SessionConflict):
+        await second.save("call", b"turn-0b", 0)
+    return await second.load("call")
+
+def test_sqlite_rejects_a_stale_save(sqlite_backends):
+    assert asyncio.run(stale_save_round_trip(*sqlite_backends)) == (b"turn-1a", 2)
+
+def test_sqlite_takes_over_an_expired_session(tmp_path):
+    async def main():
+        backend = SQLiteSessionBackend(str(tmp_path / "sessions.db"), ttl=60)
+        try:
+            await backend.save("call", b"old", 0)
+            backend.ttl = -1  # everything stored so far has expired
+            assert await backend.load("call") == (None, 0)
+            return await backend.save("call", b"new", 0)
+        finally:
+            await backend.close()
+
+    assert asyncio.run(main()) == 1
+
+def test_redis_rejects_a_stale_save(redis_backend):
+    assert asyncio.run(stale_save_round_trip(redis_backend, redis_backend)) == (b"turn-1a", 2)
+    assert redis_backend._client.expiry["flow_session:call"] == 60
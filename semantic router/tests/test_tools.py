@@ -0,0 +1,147 @@
+import asyncio
+import json
+import time
+from app.core.config import settings
+from app.flows.graph import flow_graph
+from app.flows.manager import TOOL_PREFETCH, FlowInstance
+from app.services.tools import tool_registry
+
+class FakeRouter:
+    def __init__(self, route=None, delay=0.0):
+        self.route = route
+        self.delay = delay
+
+    async def check_route(self, text, routes=None):
+        await asyncio.sleep(self.delay)
+        return self.route
+
+class ToolCallingLLM:
+    """
+    Calls the given tools before answering, like a Groq tool round, and answers with
+    the tool results.
+    """
+    def __init__(self, router, tool_calls):
+        self.router = router
+        self.tool_calls = tool_calls
+
+    async def get_response_stream(self, text, system_message, history=None, tools=None, tool_executor=None):
+        if tools and tool_executor is not None:
+            results = await tool_executor(self.tool_calls)
+            yield " | ".join(results)
+        else:
+            yield "sin herramientas"
+
+def call(name, arguments=None, call_id="call_1"):
+    return {"id": call_id, "name": name, "arguments": json.dumps(arguments or {})}
+
+def stub_handlers(monkeypatch, delay=0.0):
+    """
+    Replaces the registered tools with local stubs that record each run.
+    """
+    runs = []
+    def stub(name):
+        async def handler(arguments, flow):
+            runs.append((name, arguments))
+            await asyncio.sleep(delay)
+            return {"tool": name, **arguments}
+        return handler
+    for name in ("check_availability", "book_appointment"):
+        monkeypatch.setitem(tool_registry._handlers, name, stub(name))
+    return runs
+
+def flow_in(node_name, llm) -> FlowInstance:
+    flow = FlowInstance("call", llm)
+    flow.current_node = flow_graph.nodes[node_name]
+    flow.node_replies = 1
+    return flow
+
+async def collect(stream):
+    return "".join([chunk async for chunk in stream])
+
+def test_discarded_speculation_never_runs_tools(monkeypatch):
+    monkeypatch.setattr(settings, "SPECULATIVE_GENERATION", True)
+    runs = stub_handlers(monkeypatch)
+    # The model books right away, but routing hands the call over.
+    llm = ToolCallingLLM(FakeRouter("human_handoff", delay=0.02), [call("book_appointment", {"date": "2026-10-20", "email": "a@b.c"})])
+
+    async def main():
+        flow = flow_in("booking_process", llm)
+        reply = await collect(flow.process_input_stream("quiero hablar con una persona"))
+        return flow, reply
+
+    flow, reply = asyncio.run(main())
+    assert runs == []
+    assert flow.current_node.name == "transfer_logic"
+    assert reply == "sin herramientas"
+
+def test_kept_speculation_runs_tools_after_routing(monkeypatch):
+    monkeypatch.setattr(settings, "SPECULATIVE_GENERATION", True)
+    runs = stub_handlers(monkeypatch)
+    router = FakeRouter(None, delay=0.02)
+    llm = ToolCallingLLM(router, [call("book_appointment", {"date": "2026-10-20", "email": "a@b.c"})])
+
+    async def main():
+        flow = flow_in("booking_process", llm)
+        return await collect(flow.process_input_stream("el martes, a@b.c"))
+
+    reply = asyncio.run(main())
+    assert runs == [("book_appointment", {"date": "2026-10-20", "email": "a@b.c"})]
+    assert json.loads(reply)["tool"] == "book_appointment"
+
+def test_independent_tools_run_concurrently(monkeypatch):
+    runs = stub_handlers(monkeypatch, delay=0.1)
+
+    async def main():
+        flow = flow_in("booking_process", None)
+        start = time.perf_counter()
+        results = await flow.execute_tools([
+            call("check_availability", call_id="a"),
+            call("book_appointment", {"date": "2026-10-20"}, call_id="b"),
+        ])
+        return results, time.perf_counter() - start
+
+    results, elapsed = asyncio.run(main())
+    assert [json.loads(r)["tool"] for r in results] == ["check_availability", "book_appointment"]
+    assert len(runs) == 2
+    assert elapsed < 0.18
+
+def test_availability_is_prefetched_on_entering_offer(monkeypatch):
+    runs = stub_handlers(monkeypatch, delay=0.05)
+
+    async def main():
+        flow = flow_in("qualify_details", None)
+        flow.enter_node(flow_graph.nodes["offer_appointment"])
+        await asyncio.sleep(0.06)
+        # Ready before the model asks for it: the call is answered without running the tool again.
+        start = time.perf_counter()
+        result = await flow.execute_tools([call("check_availability")])
+        return result, time.perf_counter() - start
+
+    result, elapsed = asyncio.run(main())
+    assert runs == [("check_availability", {})]
+    assert json.loads(result[0])["tool"] == "check_availability"
+    assert elapsed < 0.02
+
+def test_restored_flow_prefetches_its_current_node(monkeypatch):
+    runs = stub_handlers(monkeypatch)
+    used = TOOL_PREFETCH.value(tool="check_availability", result="used")
+
+    async def main():
+        flow = flow_in("offer_appointment", None)
+        # As loaded from the session backend by another worker
+        restored = FlowInstance.from_snapshot("call", None, flow.snapshot(), version=3)
+        return await restored.execute_tools([call("check_availability")])
+
+    result = asyncio.run(main())
+    assert runs == [("check_availability", {})]
+    assert json.loads(result[0])["tool"] == "check_availability"
+    assert TOOL_PREFETCH.value(tool="check_availability", result="used") == used + 1
+
+def test_missing_tool_call_id_is_filled_in(monkeypatch):
+    stub_handlers(monkeypatch)
+    calls = [call("check_availability", call_id=None), call("book_appointment", {"slot": "martes"}, call_id=None)]
+
+    asyncio.run(flow_in("qualify_details", None).execute_tools(calls))
+    ids = [c["id"] for c in calls]
+    assert all(isinstance(i, str) and i for i in ids)
+    assert len(set(ids)) == 2
@@ -0,0 +1,52 @@
+import asyncio
+import threading
+from app.api import vapi_router
+from app.core import tracing
+from app.core.config import settings
+from app.core.tracing import TURN_STAGE_SECONDS, TURN_TRACES, TurnTrace
+
+class HungUpRequest:
+    async def is_disconnected(self):
+        return True
+
+async def tokens():
+    for token in ("hola", " que", " tal"):
+        await asyncio.sleep(0.01)
+        yield token
+
+def test_disconnected_turn_is_still_traced(monkeypatch):
+    monkeypatch.setattr(vapi_router, "DISCONNECT_CHECK_INTERVAL", 0.0)
+    monkeypatch.setattr(settings, "LANGFUSE_TRACE_SAMPLE_RATE", 0.0)
+    trace = TurnTrace("call", "hola")
+    trace.node, trace.route = "greeting", "hung_up"
+
+    async def main():
+        return [frame async for frame in vapi_router.vapi_sse_generator(tokens(), HungUpRequest(), trace)]
+
+    frames = asyncio.run(main())
+    assert frames == []
+    assert TURN_STAGE_SECONDS.count(stage="turn", node="greeting", route="hung_up") == 1
+
+def test_trace_outcome_is_counted_on_the_loop(monkeypatch):
+    monkeypatch.setattr(settings, "LANGFUSE_TRACE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(TurnTrace, "_send", lambda self: "sent")
+    counted_on = []
+    inc = TURN_TRACES.inc
+
+    def record(amount=1, **labels):
+        counted_on.append(threading.current_thread())
+        inc(amount, **labels)
+
+    monkeypatch.setattr(tracing.TURN_TRACES, "inc", record)
+
+    async def main():
+        TurnTrace("call", "hola").finish()
+        for _ in range(100):
+            if counted_on:
+                break
+            await asyncio.sleep(0.01)
+
+    sent = TURN_TRACES.value(outcome="sent")
+    asyncio.run(main())
+    assert counted_on == [threading.main_thread()]
+    assert TURN_TRACES.value(outcome="sent") == sent + 1
@@ -0,0 +1,101 @@
+import asyncio
+from app.flows.manager import FlowInstance, FlowManager
+from app.flows.session_backends import InMemorySessionBackend
+from app.flows.sessions import SessionStore
+from app.flows.turns import TurnCoordinator
+
+class FakeRouter:
+    async def check_route(self, text, routes=None):
+        return None
+
+class SlowLLM:
+    """
+    Streams a fixed reply slowly enough for turns to overlap.
+    """
+    def __init__(self):
+        self.router = FakeRouter()
+        self.active = 0
+        self.peak = 0
+
+    async def get_response_stream(self, text, system_message, history=None, tools=None, tool_executor=None):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            for word in ("respuesta", "a", text):
+                await asyncio.sleep(0.01)
+                yield word + " "
+        finally:
+            self.active -= 1
+
+class SlowSaveBackend(InMemorySessionBackend):
+    def __init__(self):
+        super().__init__(ttl=60, max_size=100)
+        self.saving = asyncio.Event()
+
+    async def save(self, call_id, data, expected_version):
+        self.saving.set()
+        await asyncio.sleep(0.05)
+        return await super().save(call_id, data, expected_version)
+
+def flow_manager(llm) -> FlowManager:
+    # The coordination and commit path only; no router, Groq or Qdrant clients.
+    manager = FlowManager.__new__(FlowManager)
+    manager.llm_service = llm
+    manager.backend = SlowSaveBackend()
+    manager.active_flows = SessionStore(max_size=100, idle_ttl=60)
+    manager.turns = TurnCoordinator()
+    return manager
+
+async def collect(stream):
+    return "".join([chunk async for chunk in stream])
+
+def test_newcomers_during_commit_supersede_each_other():
+    async def main():
+        llm = SlowLLM()
+        manager = flow_manager(llm)
+        first = asyncio.ensure_future(collect(manager.process_turn_stream("call", "uno")))
+        await manager.backend.saving.wait()
+        # Three requests arrive while the first turn is writing its state.
+        later = [asyncio.ensure_future(collect(manager.process_turn_stream("call", text))) for text in ("dos", "tres", "cuatro")]
+        replies = await asyncio.gather(first, *later)
+
+        flow = await manager.get_or_create_flow("call")
+        return llm.peak, replies, flow.history, flow.version
+
+    peak, replies, history, version = asyncio.run(main())
+    assert peak == 1
+    # The committing turn finishes, the superseded ones stop, the latest one runs.
+    assert replies[0] == "respuesta a uno "
+    assert replies[1] == replies[2] == ""
+    assert replies[3] == "respuesta a cuatro "
+    assert [m["content"] for m in history if m["role"] == "user"] == ["uno", "cuatro"]
+    assert version == 2
+
+def test_barge_in_cancels_generation():
+    async def main():
+        llm = SlowLLM()
+        manager = flow_manager(llm)
+        first = asyncio.ensure_future(collect(manager.process_turn_stream("call", "hola")))
+        await asyncio.sleep(0.015)
+        second = await collect(manager.process_turn_stream("call", "buenas"))
+        flow = await manager.get_or_create_flow("call")
+        return await first, second, flow.history, llm.peak
+
+    first, second, history, peak = asyncio.run(main())
+    assert peak == 1
+    assert first == "respuesta "
+    assert second == "respuesta a buenas "
+    assert [m["content"] for m in history if m["role"] == "user"] == ["buenas"]
+
+def test_save_uses_the_version_the_turn_loaded():
+    async def main():
+        manager = flow_manager(SlowLLM())
+        flow = FlowInstance("call", manager.llm_service)
+        await manager.save_flow(flow, 0)
+        # A save based on a stale read is rejected even though the shared instance is current.
+        await manager.save_flow(flow, 0)
+        return flow.version, "call" in manager.active_flows
+
+    version, cached = asyncio.run(main())
+    assert version == 1
+    assert not cached
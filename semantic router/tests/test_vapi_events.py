@@ -0,0 +1,43 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api.vapi_router import get_flow_manager, router
+
+class RecordingFlowManager:
+    def __init__(self):
+        self.ended = []
+
+    async def end_flow(self, call_id):
+        self.ended.append(call_id)
+
+@pytest.fixture
+def client_and_manager():
+    manager = RecordingFlowManager()
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_flow_manager] = lambda: manager
+    return TestClient(app), manager
+
+def test_end_of_call_drops_the_session(client_and_manager):
+    client, manager = client_and_manager
+    response = client.post("/vapi/events", json={"message": {"type": "end-of-call-report", "call": {"id": "c1"}}})
+    assert response.status_code == 200
+    assert manager.ended == ["c1"]
+
+def test_unknown_events_are_ignored(client_and_manager):
+    client, manager = client_and_manager
+    for body in ({"message": {"type": "speech-update"}}, {}, {"message": {"type": "status-update", "call": "c1"}}):
+        assert client.post("/vapi/events", json=body).status_code == 200
+    assert manager.ended == []
+
+@pytest.mark.parametrize("body", [[], "x", 3, None, {"message": ["end-of-call-report"]}])
+def test_non_object_payloads_are_rejected(client_and_manager, body):
+    client, manager = client_and_manager
+    response = client.post("/vapi/events", json=body)
+    assert response.status_code == 400
+    assert manager.ended == []
+
+def test_invalid_json_is_rejected(client_and_manager):
+    client, _ = client_and_manager
+    response = client.post("/vapi/events", content=b"{not json", headers={"content-type": "application/json"})
+    assert response.status_code == 400